@@ -0,0 +1,417 @@
+"""上传 / 合并 / 签章 / 下载 / AI盖章位置 全流程基准测试
+
+生成可配置页数、附件数与扫描页比例的合成合同，通过 Flask test client 依次调用各接口，
+OCR 模型与智谱 GLM 接口替换为本地替身。每个阶段记录延迟分位数、吞吐量与峰值 RSS，
+并与保存的基线对比。
+
+内存按阶段统计：RSS 增量为阶段内峰值 RSS 减去阶段开始时的 RSS（进程 RSS 很少回落，直接取峰值
+只能反映到目前为止的最高值）；--tracemalloc 额外记录阶段内 Python 堆分配峰值，会明显拖慢计时。
+
+用法（在 backend 目录下运行）：
+    python benchmarks/bench_pipeline.py --pages 20 --attachments 3 --scan-ratio 0.3 --iterations 20
+    python benchmarks/bench_pipeline.py --save-baseline          # 保存当前结果为基线
+    python benchmarks/bench_pipeline.py --threshold 0.2          # 任一阶段 p50/p95 变慢超过 20% 时退出码为 1
+    python benchmarks/bench_pipeline.py --tracemalloc            # 同时统计各阶段 Python 堆分配峰值
+
+与基线的合成参数（页数、附件数、是否 --tracemalloc 等，迭代次数除外）不同时不做对比，退出码为 2。
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import io
+import json
+import random
+import resource
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from unittest import mock
+
+from PIL import Image, ImageDraw
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from src.main import create_app
+from src.utils import ocr as ocr_module
+
+STAGES = ['upload', 'merge', 'apply-seal', 'download', 'ai-seal-position']
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+REGRESSION_METRICS = ['p50', 'p95']
+# 迭代次数只影响统计样本量，不影响可比性；tracemalloc 会显著拖慢计时，需与基线一致
+NON_COMPARABLE_PARAMS = ('iterations',)
+
+
+# ---------------------------------------------------------------------------
+# 合成数据
+# ---------------------------------------------------------------------------
+
+def make_scan_image(rng, width=850, height=1100):
+    """生成模拟扫描件的灰度噪点图片"""
+    image = Image.effect_noise((width // 4, height // 4), rng.randint(20, 60)).resize((width, height))
+    draw = ImageDraw.Draw(image)
+    for line in range(40):
+        y = 80 + line * 24
+        draw.line((60, y, width - 60 - rng.randint(0, 300), y), fill=30, width=3)
+    buffer = io.BytesIO()
+    image.convert('L').save(buffer, format='JPEG', quality=70)
+    buffer.seek(0)
+    return buffer
+
+
+def make_contract(pages, scan_ratio, rng, title='CONTRACT'):
+    """生成合成合同 PDF，scan_ratio 比例的页面为整页图片，其余为文本页"""
+    buffer = io.BytesIO()
+    can = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    for page_no in range(1, pages + 1):
+        if rng.random() < scan_ratio:
+            can.drawImage(ImageReader(make_scan_image(rng)), 0, 0, width=width, height=height)
+        else:
+            can.setFont('Helvetica-Bold', 14)
+            can.drawString(72, height - 72, f'{title} - page {page_no}')
+            can.setFont('Helvetica', 10)
+            for line in range(50):
+                words = ' '.join(rng.choice(['party', 'agreement', 'clause', 'payment', 'delivery', 'term',
+                                             'liability', 'seal', 'signature', 'date']) for _ in range(12))
+                can.drawString(72, height - 100 - line * 13, f'{line + 1}. {words}')
+            if page_no == pages:
+                can.drawString(360, 120, 'Party A (seal):')
+                can.drawString(360, 90, 'Date:')
+        can.showPage()
+    can.save()
+    return buffer.getvalue()
+
+
+def make_seal_image(path):
+    image = Image.new('RGBA', (200, 200), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((8, 8, 192, 192), outline=(220, 0, 0, 255), width=8)
+    draw.regular_polygon((100, 100, 36), 5, fill=(220, 0, 0, 255))
+    image.save(path)
+
+
+# ---------------------------------------------------------------------------
+# OCR / GLM 本地替身
+# ---------------------------------------------------------------------------
+
+class FakeOcr:
+    """按 PaddleOCR 的返回结构输出文本块，文本页读取真实文本，扫描页返回固定文本"""
+
+    def ocr(self, pdf_path, cls=True):
+        from PyPDF2 import PdfReader
+        result = []
+        for page in PdfReader(pdf_path).pages:
+            lines = [line for line in (page.extract_text() or '').splitlines() if line.strip()]
+            if not lines:
+                lines = ['scanned page']
+            result.append([
+                [[[72, 72 + i * 13], [500, 72 + i * 13], [500, 84 + i * 13], [72, 84 + i * 13]], (text, 0.99)]
+                for i, text in enumerate(lines)
+            ])
+        return result
+
+
+class FakeGlmResponse:
+    def __init__(self, page):
+        self._page = page
+
+    def json(self):
+        return {'data': {'position': {'page': self._page, 'x': 380, 'y': 100}}}
+
+
+# ---------------------------------------------------------------------------
+# 资源采样
+# ---------------------------------------------------------------------------
+
+def current_rss_bytes():
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # 非 Linux 平台退化为进程历史峰值（macOS 单位为字节，Linux 为 KB）
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+class RssSampler:
+    """后台线程按固定间隔采样 RSS，记录阶段开始时的 RSS 与阶段内峰值"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.start = 0
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start = self.peak = current_rss_bytes()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss_bytes())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_bytes())
+
+    @property
+    def growth(self):
+        """阶段内 RSS 增量"""
+        return self.peak - self.start
+
+
+# ---------------------------------------------------------------------------
+# 基准流程
+# ---------------------------------------------------------------------------
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def check(response, stage):
+    if response.status_code != 200:
+        raise RuntimeError(f'{stage} 失败: {response.status_code} {response.get_data(as_text=True)[:300]}')
+    return response
+
+
+def run_pipeline(client, main_pdf, attachment_pdfs, total_pages, iteration, measure):
+    """执行一次完整流程，measure(stage) 为计时并采样 RSS 的上下文管理器"""
+    with measure('upload'):
+        res = check(client.post('/api/files/upload', data={
+            'mainContract': (io.BytesIO(main_pdf), 'main.pdf')
+        }, content_type='multipart/form-data'), 'upload')
+        main_id = res.get_json()['mainContract']['id']
+        attachment_ids = []
+        if attachment_pdfs:
+            res = check(client.post('/api/files/upload', data={
+                'attachments': [(io.BytesIO(pdf), f'attachment-{i}.pdf') for i, pdf in enumerate(attachment_pdfs)]
+            }, content_type='multipart/form-data'), 'upload')
+            attachment_ids = [item['id'] for item in res.get_json()['attachments']]
+
+    with measure('merge'):
+        res = check(client.post('/api/files/merge', json={
+            'mainFileId': main_id, 'attachmentIds': attachment_ids
+        }), 'merge')
+        merged_id = res.get_json()['mergedFile']['id']
+
+    contract_info = {'contractNumber': f'BENCH{iteration:04d}', 'counterparty': 'ACME', 'contractName': 'contract'}
+    with measure('apply-seal'):
+        check(client.post('/api/files/apply-seal', json={
+            'fileId': merged_id,
+            'sealConfig': {'page': total_pages, 'x': 380, 'y': 100, 'sealId': 1},
+            'contractInfo': contract_info
+        }), 'apply-seal')
+
+    with measure('download'):
+        res = check(client.get(f'/api/files/download/{merged_id}', query_string=contract_info), 'download')
+        res.get_data()
+        res.close()
+
+    with measure('ai-seal-position'):
+        with mock.patch('requests.post', return_value=FakeGlmResponse(total_pages)):
+            check(client.post('/api/files/ai-seal-position', json={'fileId': merged_id}), 'ai-seal-position')
+
+
+def run_benchmark(args):
+    rng = random.Random(args.seed)
+    main_pdf = make_contract(args.pages, args.scan_ratio, rng, 'MAIN CONTRACT')
+    attachment_pdfs = [make_contract(args.attachment_pages, args.scan_ratio, rng, f'ATTACHMENT {i + 1}')
+                       for i in range(args.attachments)]
+    total_pages = args.pages + args.attachments * args.attachment_pages
+
+    work_dir = tempfile.mkdtemp(prefix='esign-bench-')
+    try:
+        seals_folder = os.path.join(work_dir, 'seals')
+        os.makedirs(seals_folder)
+        make_seal_image(os.path.join(seals_folder, '1.png'))
+        app = create_app({
+            'TESTING': True,
+            'UPLOAD_FOLDER': os.path.join(work_dir, 'uploads'),
+            'PROCESSED_FOLDER': os.path.join(work_dir, 'processed'),
+            'META_FOLDER': os.path.join(work_dir, 'meta'),
+            'SEALS_FOLDER': seals_folder,
+            'FILE_DELIVERY_MODE': args.delivery_mode
+        })
+        client = app.test_client()
+
+        samples = {stage: [] for stage in STAGES}
+        rss_growth = {stage: 0 for stage in STAGES}
+        heap_peaks = {stage: 0 for stage in STAGES}
+        timing = {'active': False}
+
+        @contextmanager
+        def measure(stage):
+            if args.tracemalloc:
+                tracemalloc.reset_peak()
+                heap_start = tracemalloc.get_traced_memory()[0]
+            with RssSampler() as sampler:
+                start = time.perf_counter()
+                yield
+                elapsed = time.perf_counter() - start
+            if timing['active']:
+                samples[stage].append(elapsed)
+                rss_growth[stage] = max(rss_growth[stage], sampler.growth)
+                if args.tracemalloc:
+                    heap_peaks[stage] = max(heap_peaks[stage], tracemalloc.get_traced_memory()[1] - heap_start)
+
+        if args.tracemalloc:
+            tracemalloc.start()
+
+        with mock.patch.object(ocr_module, '_ocr', FakeOcr()):
+            # 预热一次，不计入结果
+            run_pipeline(client, main_pdf, attachment_pdfs, total_pages, 0, measure)
+            timing['active'] = True
+            for iteration in range(1, args.iterations + 1):
+                run_pipeline(client, main_pdf, attachment_pdfs, total_pages, iteration, measure)
+    finally:
+        if args.tracemalloc:
+            tracemalloc.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {}
+    for stage in STAGES:
+        values = samples[stage]
+        total_time = sum(values)
+        results[stage] = {
+            'count': len(values),
+            'mean': statistics.mean(values),
+            'p50': percentile(values, 50),
+            'p90': percentile(values, 90),
+            'p95': percentile(values, 95),
+            'p99': percentile(values, 99),
+            'throughput': len(values) / total_time if total_time else 0.0,
+            'pagesPerSecond': len(values) * total_pages / total_time if total_time else 0.0,
+            'rssGrowthMb': round(rss_growth[stage] / (1024 * 1024), 1),
+            'heapPeakMb': round(heap_peaks[stage] / (1024 * 1024), 1) if args.tracemalloc else None
+        }
+    return {
+        'params': {
+            'pages': args.pages,
+            'attachments': args.attachments,
+            'attachmentPages': args.attachment_pages,
+            'scanRatio': args.scan_ratio,
+            'iterations': args.iterations,
+            'seed': args.seed,
+            'deliveryMode': args.delivery_mode,
+            'tracemalloc': args.tracemalloc
+        },
+        'createdAt': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'stages': results
+    }
+
+
+def comparable_params(params):
+    return {key: value for key, value in (params or {}).items() if key not in NON_COMPARABLE_PARAMS}
+
+
+def compare(results, baseline, threshold):
+    """与基线对比，返回 (回归列表, 报告行)；调用方需先确认合成参数一致"""
+    regressions = []
+    lines = []
+    for stage in STAGES:
+        base = baseline.get('stages', {}).get(stage)
+        if not base:
+            continue
+        for metric in REGRESSION_METRICS:
+            old, new = base[metric], results['stages'][stage][metric]
+            change = (new - old) / old if old else 0.0
+            flag = ''
+            if change > threshold:
+                flag = '  <-- 回归'
+                regressions.append((stage, metric, change))
+            lines.append(f'{stage:<18} {metric:<4} {old * 1000:9.1f}ms -> {new * 1000:9.1f}ms  {change:+7.1%}{flag}')
+    return regressions, lines
+
+
+def print_results(results):
+    print(f"参数: {results['params']}")
+    header = (f"{'stage':<18}{'p50(ms)':>10}{'p90(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'ops/s':>9}{'pages/s':>10}"
+              f"{'+RSS(MB)':>10}" + (f"{'heap(MB)':>10}" if results['params']['tracemalloc'] else ''))
+    print(header)
+    print('-' * len(header))
+    for stage in STAGES:
+        s = results['stages'][stage]
+        line = (f"{stage:<18}{s['p50'] * 1000:>10.1f}{s['p90'] * 1000:>10.1f}{s['p95'] * 1000:>10.1f}"
+                f"{s['p99'] * 1000:>10.1f}{s['throughput']:>9.2f}{s['pagesPerSecond']:>10.1f}{s['rssGrowthMb']:>10.1f}")
+        if results['params']['tracemalloc']:
+            line += f"{s['heapPeakMb']:>10.1f}"
+        print(line)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='电子签章处理流程基准测试')
+    parser.add_argument('--pages', type=int, default=10, help='主合同页数')
+    parser.add_argument('--attachments', type=int, default=2, help='附件数量')
+    parser.add_argument('--attachment-pages', type=int, default=5, help='每个附件页数')
+    parser.add_argument('--scan-ratio', type=float, default=0.3, help='扫描页（整页图片）比例 0~1')
+    parser.add_argument('--iterations', type=int, default=10, help='计时迭代次数（另有 1 次预热）')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子，保证合成数据可复现')
+    parser.add_argument('--delivery-mode', default='sendfile', help='FILE_DELIVERY_MODE')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='基线文件路径')
+    parser.add_argument('--save-baseline', action='store_true', help='将本次结果保存为基线')
+    parser.add_argument('--threshold', type=float, default=0.15, help='判定回归的相对变慢阈值')
+    parser.add_argument('--tracemalloc', action='store_true', help='统计各阶段 Python 堆分配峰值（会拖慢计时）')
+    parser.add_argument('--output', help='将结果写入 JSON 文件')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run_benchmark(args)
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f'基线已保存: {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f'未找到基线文件 {args.baseline}，使用 --save-baseline 生成')
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if comparable_params(baseline.get('params')) != comparable_params(results['params']):
+        print()
+        print('基线的合成参数与本次运行不同，无法对比：')
+        print(f"  基线: {baseline.get('params')}")
+        print(f"  本次: {results['params']}")
+        print('请使用与基线相同的参数运行，或使用 --save-baseline 重新生成基线')
+        return 2
+    regressions, lines = compare(results, baseline, args.threshold)
+    print()
+    print(f'与基线对比（阈值 {args.threshold:.0%}）：')
+    for line in lines:
+        print(line)
+    if regressions:
+        print(f'发现 {len(regressions)} 项性能回归')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,42 @@
+# gunicorn 配置，在 backend 目录下运行：gunicorn -c gunicorn.conf.py
+import os
+import shutil
+import tempfile
+import multiprocessing
+
+wsgi_app = 'src.wsgi:app'
+bind = os.environ.get('ESIGN_BIND', '0.0.0.0:5050')
+workers = int(os.environ.get('ESIGN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('ESIGN_THREADS', 2))
+timeout = int(os.environ.get('ESIGN_TIMEOUT', 120))
+
+# 默认开启预加载：主进程加载应用与 PDF 库后再 fork，worker 间共享只读内存页
+preload_app = os.environ.get('ESIGN_PRELOAD', '1') == '1'
+raw_env = [f"ESIGN_PRELOAD={'1' if preload_app else '0'}"]
+
+# 指标多进程模式：需在加载应用（导入 prometheus_client）之前设置，/metrics 汇总所有 worker
+metrics_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'esign-metrics'))
+os.makedirs(metrics_dir, exist_ok=True)
+
+
+def on_starting(server):
+    """清空上次运行遗留的指标文件（预加载时主进程已写入的文件一并清除，主进程不处理请求）"""
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def post_fork(server, worker):
+    """worker fork 完成后在后台预热 PDF 库（预加载模式下已就绪则跳过）"""
+    from src.utils import warmup
+    warmup.start_background_warmup()
+
+
+def worker_exit(server, worker):
+    """关闭 worker 内的签名进程池"""
+    from src.utils.pdf_sign import shutdown_pool
+    shutdown_pool()
+
+
+def child_exit(server, worker):
+    from src.utils.metrics import mark_worker_dead
+    mark_worker_dead(worker.pid)
@@ -3,58 +3,110 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask
 from flask_cors import CORS
 from src.models.user import db
 from src.routes.user import user_bp
 from src.routes.seals import seals_bp
 from src.routes.files import files_bp
+from src.routes.health import health_bp
+from src.routes.metrics import metrics_bp
+from src.utils import warmup, instrumentation
+from src.utils.static_assets import StaticManifest
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
-
-# 配置文件上传和处理目录
-app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'uploads')
-app.config['PROCESSED_FOLDER'] = os.path.join(os.path.dirname(__file__), 'processed')
-app.config['SEALS_FOLDER'] = os.path.join(os.path.dirname(__file__), 'seals')  # 新增印章图片目录
-app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
-
-# 确保目录存在
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs(app.config['PROCESSED_FOLDER'], exist_ok=True)
-os.makedirs(app.config['SEALS_FOLDER'], exist_ok=True)  # 新增确保seals目录存在
-
-# 启用CORS
-CORS(app)
-
-# 注册蓝图
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(seals_bp, url_prefix='/api')
-app.register_blueprint(files_bp, url_prefix='/api/files')
-
-# uncomment if you need to use database
-# app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-# app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-# db.init_app(app)
-# with app.app_context():
-#     db.create_all()
-
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "index.html not found", 404
+
+def create_app(config=None):
+    """应用工厂，供开发服务器与多进程 WSGI 服务器（gunicorn 等）使用"""
+    # 不注册 Flask 内置的 /static 路由，前端文件只经由 serve() 与静态资源清单提供
+    app = Flask(__name__, static_folder=None)
+    app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+    app.config['STATIC_FOLDER'] = os.path.join(os.path.dirname(__file__), 'static')
+
+    # 配置文件上传和处理目录
+    app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'uploads')
+    app.config['PROCESSED_FOLDER'] = os.path.join(os.path.dirname(__file__), 'processed')
+    app.config['SEALS_FOLDER'] = os.path.join(os.path.dirname(__file__), 'seals')  # 新增印章图片目录
+    app.config['META_FOLDER'] = os.path.join(os.path.dirname(__file__), 'meta')  # 上传/处理文件的元数据
+    app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
+    app.config['UPLOAD_VALIDATION_WORKERS'] = 4  # 上传校验线程数
+    # PDF 下发方式：sendfile / x-accel / x-sendfile / python，详见 src/utils/file_delivery.py
+    app.config['FILE_DELIVERY_MODE'] = os.environ.get('ESIGN_FILE_DELIVERY', 'sendfile')
+    app.config['X_ACCEL_PREFIX'] = os.environ.get('ESIGN_X_ACCEL_PREFIX', '/protected/')
+    # 无构建时 .br 文件时，运行时按需压缩的 br 级别（需安装 Brotli）
+    app.config['STATIC_BROTLI_QUALITY'] = 5
+
+    # 数字签名证书（PEM/DER），配置后 apply-seal 默认追加 PKCS#7 签名
+    # 测试证书可用 python -m src.utils.pdf_sign gen-test-cert <目录> 生成
+    app.config['SIGNING_KEY_PATH'] = os.environ.get('ESIGN_SIGNING_KEY')
+    app.config['SIGNING_CERT_PATH'] = os.environ.get('ESIGN_SIGNING_CERT')
+    app.config['SIGNING_CHAIN_PATH'] = os.environ.get('ESIGN_SIGNING_CHAIN')
+    app.config['SIGNING_KEY_PASSWORD'] = os.environ.get('ESIGN_SIGNING_KEY_PASSWORD')
+    # 批量签名：每个 WSGI worker 的签名进程数与单次请求文件数上限
+    app.config['SIGNING_BATCH_WORKERS'] = int(os.environ.get('ESIGN_SIGNING_BATCH_WORKERS', 2))
+    app.config['SIGNING_BATCH_MAX_FILES'] = 50
+    app.config['SIGNATURE_REASON'] = '电子签章'
+    app.config['SIGNATURE_LOCATION'] = None
+
+    # 按需性能采样，详见 src/utils/instrumentation.py
+    app.config['PROFILING_ENABLED'] = os.environ.get('ESIGN_PROFILING', '0') == '1'
+    app.config['PROFILE_HEADER'] = 'X-Profile'
+    app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('ESIGN_PROFILE_SAMPLE_RATE', '0'))
+    app.config['PROFILE_SLOW_MS'] = 1000
+    app.config['PROFILE_DIR'] = os.path.join(os.path.dirname(__file__), 'profiles')
+
+    # 预加载模式：在 fork 之前同步加载 PDF 库，各 worker 共享已加载的模块
+    # 非预加载模式：worker 启动后在后台线程中预热（gunicorn 下由 post_fork 钩子启动），就绪状态见 /api/health/ready
+    app.config['PRELOAD_PDF_LIBS'] = os.environ.get('ESIGN_PRELOAD', '0') == '1'
+
+    if config:
+        app.config.update(config)
+
+    # 确保目录存在
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['PROCESSED_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['SEALS_FOLDER'], exist_ok=True)  # 新增确保seals目录存在
+    os.makedirs(app.config['META_FOLDER'], exist_ok=True)
+
+    # 启用CORS
+    CORS(app)
+
+    # 注册蓝图
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(seals_bp, url_prefix='/api')
+    app.register_blueprint(files_bp, url_prefix='/api/files')
+    app.register_blueprint(health_bp, url_prefix='/api/health')
+    app.register_blueprint(metrics_bp)
+
+    # 请求计时与性能采样
+    instrumentation.init_app(app)
+
+    # uncomment if you need to use database
+    # app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+    # app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # db.init_app(app)
+    # with app.app_context():
+    #     db.create_all()
+
+    # 启动时建立静态资源清单（读取构建时的预压缩文件），请求时不再访问磁盘
+    static_folder = app.config['STATIC_FOLDER']
+    static_manifest = StaticManifest(static_folder, app.config['STATIC_BROTLI_QUALITY']) if static_folder else None
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        if static_manifest is None:
+                return "Static folder not configured", 404
+        return static_manifest.serve(path)
+
+    # gunicorn 下 create_app 可能在 fork 前的主进程中执行，后台预热交给 post_fork 钩子
+    if app.config['PRELOAD_PDF_LIBS']:
+        warmup.preload_pdf_libs()
+    elif not warmup.in_gunicorn():
+        warmup.start_background_warmup()
+
+    return app
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5050, debug=True)
\ No newline at end of file
+    app = create_app()
+    app.run(host='0.0.0.0', port=5050, debug=os.environ.get('FLASK_DEBUG', '1') == '1')
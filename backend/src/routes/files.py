@@ -1,15 +1,20 @@
-from flask import Blueprint, request, jsonify, send_file, current_app
+from flask import Blueprint, request, jsonify, current_app
 import os
 import uuid
+import tempfile
 from datetime import datetime
 import json
 import base64
 from werkzeug.utils import secure_filename
-from PyPDF2 import PdfReader, PdfWriter
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from reportlab.lib.pagesizes import letter
 from io import BytesIO
+from src.utils.metrics import span, PAGES_PROCESSED, BYTES_WRITTEN
+from src.utils.file_delivery import deliver_file, is_within_folder
+from src.utils.pdf_sign import PdfSignError, SignerConfigError, get_signer, sign_pdf, sign_batch
+from src.utils.ocr import get_ocr, run_ocr, OcrUnavailableError
+from src.utils.pdf_meta import (
+    PdfValidationError, get_executor, save_and_inspect,
+    inspect_pdf, save_file_meta, load_file_meta, get_or_inspect_meta
+)
 
 files_bp = Blueprint('files', __name__)
 
@@ -19,6 +24,95 @@ ALLOWED_EXTENSIONS = {'pdf'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def _validate_uploads(file_storages, file_type):
+    """在线程池中并发保存并校验上传文件，返回 (文件信息列表, 错误列表)"""
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    executor = get_executor(current_app.config['UPLOAD_VALIDATION_WORKERS'])
+
+    jobs = []
+    for file_storage in file_storages:
+        file_id = str(uuid.uuid4())
+        file_path = os.path.join(upload_folder, f"{file_id}.pdf")
+        jobs.append((file_storage, file_id, file_path, executor.submit(save_and_inspect, file_storage, file_path)))
+
+    file_infos = []
+    errors = []
+    with span('upload.validate'):
+        for file_storage, file_id, file_path, future in jobs:
+            try:
+                meta = future.result()
+            except PdfValidationError as e:
+                errors.append(f'{file_storage.filename}: {str(e)}')
+                continue
+            except Exception as e:
+                # 保存失败（磁盘、权限等）同样按校验失败处理，走统一的整批清理
+                errors.append(f'{file_storage.filename}: 文件保存失败: {str(e)}')
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                continue
+            file_infos.append({
+                'id': file_id,
+                'name': file_storage.filename,
+                'path': file_path,
+                'size': meta['size'],
+                'type': file_type,
+                'uploadTime': datetime.now().isoformat(),
+                'pdfVersion': meta['pdfVersion'],
+                'pages': meta['pages'],
+                'pageSizes': meta['pageSizes']
+            })
+
+    # 同一批次中只要有文件校验失败，整批不予保存
+    if errors:
+        for file_info in file_infos:
+            if os.path.exists(file_info['path']):
+                os.remove(file_info['path'])
+        return [], errors
+
+    for file_info in file_infos:
+        save_file_meta(current_app.config['META_FOLDER'], file_info['id'], file_info)
+        PAGES_PROCESSED.inc(file_info['pages'], stage='upload')
+        BYTES_WRITTEN.inc(file_info['size'], stage='upload')
+    return file_infos, []
+
+def find_file(file_id, folders):
+    """按目录顺序查找文件，每个目录先按 <file_id>.pdf 精确匹配，再按文件名包含ID查找"""
+    if not file_id or '/' in file_id or '\\' in file_id or file_id in ('.', '..'):
+        return None
+    with span('lookup'):
+        for folder in folders:
+            exact_path = os.path.join(folder, f"{file_id}.pdf")
+            if os.path.exists(exact_path):
+                return exact_path
+            if os.path.exists(folder):
+                for filename in os.listdir(folder):
+                    if file_id in filename:
+                        return os.path.join(folder, filename)
+    return None
+
+def find_processed_file(file_id):
+    """按文件ID精确查找 processed 目录中的文件，返回 (路径, 元数据)
+
+    签章后的文件按合同信息命名，路径只能从元数据中取得；没有元数据时按 <file_id>.pdf 查找。
+    不做文件名包含匹配，避免就地改写文件的接口误命中其他文件。
+    """
+    if not isinstance(file_id, str) or not file_id or '/' in file_id or '\\' in file_id or file_id in ('.', '..'):
+        return None, None
+    processed_folder = current_app.config['PROCESSED_FOLDER']
+    meta = load_file_meta(current_app.config['META_FOLDER'], file_id)
+    file_path = meta.get('path') if meta else os.path.join(processed_folder, f"{file_id}.pdf")
+    if not file_path or not is_within_folder(file_path, processed_folder) or not os.path.isfile(file_path):
+        return None, None
+    return file_path, meta
+
+def _signer_args():
+    """已配置签名证书时返回 (私钥, 证书, 证书链, 密码)，否则返回 None"""
+    key_path = current_app.config['SIGNING_KEY_PATH']
+    cert_path = current_app.config['SIGNING_CERT_PATH']
+    if not key_path or not cert_path:
+        return None
+    return (key_path, cert_path, current_app.config['SIGNING_CHAIN_PATH'], current_app.config['SIGNING_KEY_PASSWORD'])
+
 @files_bp.route('/upload', methods=['POST'])
 def upload_files():
     """上传文件接口"""
@@ -30,42 +124,24 @@ def upload_files():
                 return jsonify({'error': '未选择主合同文件'}), 400
             if not allowed_file(main_file.filename):
                 return jsonify({'error': '不支持的文件格式，请上传PDF文件'}), 400
-            main_file_id = str(uuid.uuid4())
-            main_file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], f"{main_file_id}.pdf")
-            main_file.save(main_file_path)
-            main_file_info = {
-                'id': main_file_id,
-                'name': main_file.filename,
-                'path': main_file_path,
-                'size': os.path.getsize(main_file_path),
-                'type': 'main',
-                'uploadTime': datetime.now().isoformat()
-            }
+            main_files, errors = _validate_uploads([main_file], 'main')
+            if errors:
+                return jsonify({'error': f'主合同文件校验失败: {errors[0]}', 'details': errors}), 400
             return jsonify({
                 'success': True,
-                'mainContract': main_file_info,
+                'mainContract': main_files[0],
                 'message': '主合同文件上传成功'
             }), 200
 
         # 附件上传（支持单个或多个附件）
         if 'attachments' in request.files:
             attachment_files = request.files.getlist('attachments')
-            saved_attachments = []
             for attachment in attachment_files:
-                if attachment.filename != '' and allowed_file(attachment.filename):
-                    att_file_id = str(uuid.uuid4())
-                    att_file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], f"{att_file_id}.pdf")
-                    attachment.save(att_file_path)
-                    saved_attachments.append({
-                        'id': att_file_id,
-                        'name': attachment.filename,
-                        'path': att_file_path,
-                        'size': os.path.getsize(att_file_path),
-                        'type': 'attachment',
-                        'uploadTime': datetime.now().isoformat()
-                    })
-                else:
+                if attachment.filename == '' or not allowed_file(attachment.filename):
                     return jsonify({'error': f'附件文件格式错误或未选择文件: {getattr(attachment, "filename", "")}'}), 400
+            saved_attachments, errors = _validate_uploads(attachment_files, 'attachment')
+            if errors:
+                return jsonify({'error': f'附件文件校验失败: {"; ".join(errors)}', 'details': errors}), 400
             return jsonify({
                 'success': True,
                 'attachments': saved_attachments,
@@ -100,31 +176,44 @@ def merge_files():
             if not os.path.exists(attachment_path):
                 return jsonify({'error': f'附件文件不存在: {attachment_id}'}), 404
 
+        # 读取上传时保存的元数据（历史文件缺失时解析一次）
+        meta_folder = current_app.config['META_FOLDER']
+        try:
+            source_metas = [
+                get_or_inspect_meta(meta_folder, source_id, os.path.join(upload_folder, f"{source_id}.pdf"))
+                for source_id in [main_file_id] + attachment_ids
+            ]
+        except PdfValidationError as e:
+            return jsonify({'error': f'源文件校验失败: {str(e)}'}), 400
+
         # 生成合并文件名和路径
         merged_file_id = str(uuid.uuid4())
         merged_filename = f"{merged_file_id}.pdf"
         merged_file_path = os.path.join(current_app.config['PROCESSED_FOLDER'], merged_filename)
         
         # 使用PyPDF2进行真实的PDF合并
+        from PyPDF2 import PdfReader, PdfWriter
         writer = PdfWriter()
         
-        # 添加主合同页面
-        with open(main_file_path, 'rb') as main_file:
-            main_reader = PdfReader(main_file)
-            for page in main_reader.pages:
-                writer.add_page(page)
-        
-        # 添加附件页面
-        for attachment_id in attachment_ids:
-            attachment_path = os.path.join(upload_folder, f"{attachment_id}.pdf")
-            with open(attachment_path, 'rb') as att_file:
-                att_reader = PdfReader(att_file)
-                for page in att_reader.pages:
+        with span('merge.parse'):
+            # 添加主合同页面
+            with open(main_file_path, 'rb') as main_file:
+                main_reader = PdfReader(main_file)
+                for page in main_reader.pages:
                     writer.add_page(page)
+            
+            # 添加附件页面
+            for attachment_id in attachment_ids:
+                attachment_path = os.path.join(upload_folder, f"{attachment_id}.pdf")
+                with open(attachment_path, 'rb') as att_file:
+                    att_reader = PdfReader(att_file)
+                    for page in att_reader.pages:
+                        writer.add_page(page)
         
         # 写入合并后的PDF文件
-        with open(merged_file_path, 'wb') as merged_file:
-            writer.write(merged_file)
+        with span('merge.write'):
+            with open(merged_file_path, 'wb') as merged_file:
+                writer.write(merged_file)
         
         # 获取合并后文件信息
         merged_file_info = {
@@ -134,8 +223,13 @@ def merge_files():
             'size': os.path.getsize(merged_file_path),
             'type': 'merged',
             'mergedAt': datetime.now().isoformat(),
-            'sourceFiles': [main_file_id] + attachment_ids
+            'sourceFiles': [main_file_id] + attachment_ids,
+            'pages': sum(meta['pages'] for meta in source_metas),
+            'pageSizes': [size for meta in source_metas for size in meta['pageSizes']]
         }
+        save_file_meta(meta_folder, merged_file_id, merged_file_info)
+        PAGES_PROCESSED.inc(merged_file_info['pages'], stage='merge')
+        BYTES_WRITTEN.inc(merged_file_info['size'], stage='merge')
         
         return jsonify({
             'success': True,
@@ -164,23 +258,29 @@ def apply_seal():
         y = float(seal_config.get('y', 0))
         seal_id = str(seal_config.get('sealId'))
 
+        # 已配置证书时默认同时添加数字签名，可通过 digitalSignature 显式关闭
+        signer_args = _signer_args()
+        digital_signature = data.get('digitalSignature', signer_args is not None)
+        if digital_signature and signer_args is None:
+            return jsonify({'error': '未配置数字签名证书'}), 400
+
         # 印章图片路径
         seal_img_path = os.path.join(current_app.config['SEALS_FOLDER'], f"{seal_id}.png")
         if not os.path.exists(seal_img_path):
             return jsonify({'error': '印章图片不存在'}), 400
 
         # 查找合并后的PDF
-        merged_pdf_path = None
-        for folder in [current_app.config['PROCESSED_FOLDER'], current_app.config['UPLOAD_FOLDER']]:
-            for filename in os.listdir(folder):
-                if filename.startswith(file_id) or file_id in filename:
-                    merged_pdf_path = os.path.join(folder, filename)
-                    break
-            if merged_pdf_path:
-                break
+        merged_pdf_path = find_file(file_id, [current_app.config['PROCESSED_FOLDER'], current_app.config['UPLOAD_FOLDER']])
         if not merged_pdf_path or not os.path.exists(merged_pdf_path):
             return jsonify({'error': '待签章PDF文件不存在'}), 404
 
+        # 有元数据时先校验页码，避免无效请求解析整个文件
+        file_meta = None
+        if os.path.basename(merged_pdf_path) == f"{file_id}.pdf":
+            file_meta = load_file_meta(current_app.config['META_FOLDER'], file_id)
+        if file_meta and (page_num < 1 or page_num > file_meta['pages']):
+            return jsonify({'error': f'签章页码超出范围，当前文档共 {file_meta["pages"]} 页'}), 400
+
         # 生成签章后文件名
         contract_number = contract_info.get('contractNumber', 'CONTRACT')
         counterparty = contract_info.get('counterparty', 'PARTNER')
@@ -190,26 +290,53 @@ def apply_seal():
         sealed_file_id = str(uuid.uuid4())
 
         # 读取原PDF并加盖印章
+        from PyPDF2 import PdfReader, PdfWriter
+        from reportlab.pdfgen import canvas
+        from reportlab.lib.utils import ImageReader
         reader = PdfReader(merged_pdf_path)
         writer = PdfWriter()
         total_pages = len(reader.pages)
         if page_num < 1 or page_num > total_pages:
             return jsonify({'error': f'签章页码超出范围，当前文档共 {total_pages} 页'}), 400
 
-        for i, page in enumerate(reader.pages, start=1):
-            if i == page_num:
-                # 生成印章overlay
-                packet = BytesIO()
-                can = canvas.Canvas(packet, pagesize=letter)
-                can.drawImage(ImageReader(seal_img_path), x, y, width=100, height=100, mask='auto')
-                can.save()
-                packet.seek(0)
-                overlay = PdfReader(packet)
-                page.merge_page(overlay.pages[0])
-            writer.add_page(page)
-
-        with open(sealed_file_path, 'wb') as f:
-            writer.write(f)
+        with span('seal.render'):
+            for i, page in enumerate(reader.pages, start=1):
+                if i == page_num:
+                    # 生成印章overlay
+                    packet = BytesIO()
+                    if file_meta:
+                        page_size = file_meta['pageSizes'][i - 1]
+                        overlay_size = (page_size['width'], page_size['height'])
+                    else:
+                        overlay_size = (float(page.mediabox.width), float(page.mediabox.height))
+                    can = canvas.Canvas(packet, pagesize=overlay_size)
+                    can.drawImage(ImageReader(seal_img_path), x, y, width=100, height=100, mask='auto')
+                    can.save()
+                    packet.seek(0)
+                    overlay = PdfReader(packet)
+                    page.merge_page(overlay.pages[0])
+                writer.add_page(page)
+
+        # 先写入临时文件，签名成功后再替换到最终文件名，失败时不留下未签名的文件
+        fd, tmp_path = tempfile.mkstemp(prefix='.seal-', suffix='.tmp', dir=current_app.config['PROCESSED_FOLDER'])
+        os.close(fd)
+        try:
+            with span('seal.write'):
+                with open(tmp_path, 'wb') as f:
+                    writer.write(f)
+
+            # 以增量更新方式追加 PKCS#7 数字签名
+            signature_info = None
+            if digital_signature:
+                with span('sign'):
+                    signature_info = sign_pdf(
+                        tmp_path, tmp_path, get_signer(*signer_args), page=page_num,
+                        reason=current_app.config['SIGNATURE_REASON'], location=current_app.config['SIGNATURE_LOCATION']
+                    )
+            os.replace(tmp_path, sealed_file_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
 
         sealed_file_info = {
             'id': sealed_file_id,
@@ -219,8 +346,21 @@ def apply_seal():
             'type': 'sealed',
             'sealedAt': datetime.now().isoformat(),
             'sealConfig': seal_config,
-            'contractInfo': contract_info
+            'contractInfo': contract_info,
+            'signature': signature_info,
+            'pages': total_pages,
+            'pageSizes': file_meta['pageSizes'] if file_meta else [
+                {
+                    'width': round(float(page.mediabox.width), 2),
+                    'height': round(float(page.mediabox.height), 2),
+                    'rotation': int(page.get('/Rotate', 0) or 0)
+                }
+                for page in reader.pages
+            ]
         }
+        save_file_meta(current_app.config['META_FOLDER'], sealed_file_id, sealed_file_info)
+        PAGES_PROCESSED.inc(total_pages, stage='seal')
+        BYTES_WRITTEN.inc(sealed_file_info['size'], stage='seal')
 
         return jsonify({
             'success': True,
@@ -228,9 +368,84 @@ def apply_seal():
             'message': '印章应用成功'
         })
 
+    except SignerConfigError as e:
+        return jsonify({'error': f'数字签名失败: {str(e)}'}), 500
+    except PdfSignError as e:
+        return jsonify({'error': f'数字签名失败: {str(e)}'}), 400
     except Exception as e:
         return jsonify({'error': f'印章应用失败: {str(e)}'}), 500
 
+@files_bp.route('/sign-batch', methods=['POST'])
+def sign_batch_files():
+    """批量对已处理文件追加数字签名（进程池并行）"""
+    try:
+        data = request.get_json()
+        if not isinstance(data, dict):
+            return jsonify({'error': '请求体必须为JSON对象'}), 400
+        file_ids = data.get('fileIds', [])
+        if not file_ids:
+            return jsonify({'error': '缺少文件ID参数'}), 400
+        if not isinstance(file_ids, list) or not all(isinstance(file_id, str) for file_id in file_ids):
+            return jsonify({'error': 'fileIds 必须为文件ID字符串数组'}), 400
+        # 整批在当前请求内同步完成，限制单次文件数以免长时间占用 WSGI worker
+        max_files = current_app.config['SIGNING_BATCH_MAX_FILES']
+        if len(file_ids) > max_files:
+            return jsonify({'error': f'单次最多签名 {max_files} 个文件'}), 400
+
+        signer_args = _signer_args()
+        if signer_args is None:
+            return jsonify({'error': '未配置数字签名证书'}), 400
+
+        results = {}
+        jobs = []
+        job_paths = set()
+        for file_id in file_ids:
+            if file_id in results or any(job[0] == file_id for job in jobs):
+                continue
+            file_path, file_meta = find_processed_file(file_id)
+            if not file_path:
+                results[file_id] = {'id': file_id, 'success': False, 'error': '文件不存在'}
+                continue
+            # 同一文件在一批中只签一次，避免并发改写同一路径
+            real_path = os.path.realpath(file_path)
+            if real_path in job_paths:
+                results[file_id] = {'id': file_id, 'success': False, 'error': '与本批次中其他文件ID指向同一文件'}
+                continue
+            job_paths.add(real_path)
+            jobs.append((file_id, file_path, file_meta))
+
+        with span('sign.batch'):
+            signed = sign_batch(
+                [(file_path, file_path) for _, file_path, _ in jobs], signer_args,
+                max_workers=current_app.config['SIGNING_BATCH_WORKERS'],
+                reason=current_app.config['SIGNATURE_REASON'], location=current_app.config['SIGNATURE_LOCATION']
+            )
+        meta_folder = current_app.config['META_FOLDER']
+        for (file_id, file_path, file_meta), result in zip(jobs, signed):
+            signature_info = {key: value for key, value in result.items() if key not in ('input', 'output', 'success')}
+            results[file_id] = {
+                'id': file_id,
+                'name': os.path.basename(file_path),
+                'success': result['success'],
+                **signature_info
+            }
+            if result['success']:
+                size = os.path.getsize(file_path)
+                results[file_id]['size'] = size
+                # 签名后文件大小变化，同步更新元数据（JSON 与进程内缓存）
+                if file_meta:
+                    save_file_meta(meta_folder, file_id, {**file_meta, 'size': size, 'signature': signature_info})
+
+        ordered = [results[file_id] for file_id in file_ids]
+        return jsonify({
+            'success': all(item['success'] for item in ordered),
+            'results': ordered,
+            'message': f'已签名 {sum(1 for item in ordered if item["success"])}/{len(ordered)} 个文件'
+        })
+
+    except Exception as e:
+        return jsonify({'error': f'批量签名失败: {str(e)}'}), 500
+
 @files_bp.route('/rename', methods=['POST'])
 def rename_file():
     """重命名文件"""
@@ -285,62 +500,48 @@ def download_file(file_id):
     if contract_number and counterparty and contract_name:
         filename = f"{contract_number}-{counterparty}-{contract_name}.pdf"
         candidate = os.path.join(processed_folder, filename)
-        if os.path.exists(candidate):
+        if is_within_folder(candidate, processed_folder) and os.path.exists(candidate):
             file_path = candidate
 
     # 否则按 file_id 查找（兼容老逻辑）
     if not file_path:
-        # 先查 processed 文件夹
-        for filename in os.listdir(processed_folder):
-            if file_id in filename:
-                file_path = os.path.join(processed_folder, filename)
-                break
-        # 再查 upload 文件夹
-        if not file_path:
-            for filename in os.listdir(upload_folder):
-                if file_id in filename:
-                    file_path = os.path.join(upload_folder, filename)
-                    break
+        # 先查 processed 文件夹，再查 upload 文件夹
+        file_path = find_file(file_id, [processed_folder, upload_folder])
 
     if not file_path or not os.path.exists(file_path):
         return jsonify({'error': '文件不存在'}), 404
 
-    return send_file(file_path, as_attachment=True)
-        
+    return deliver_file(file_path, as_attachment=True)
+
 
 @files_bp.route('/preview/<file_id>')
 def preview_file(file_id):
     """预览文件接口"""
     try:
         # 查找文件
-        folders = [
+        file_path = find_file(file_id, [
             current_app.config['UPLOAD_FOLDER'],
             current_app.config['PROCESSED_FOLDER']
-        ]
-        
-        file_path = None
-        filename = None
-        
-        for folder in folders:
-            if os.path.exists(folder):
-                for file in os.listdir(folder):
-                    if file.startswith(file_id) or file_id in file:
-                        file_path = os.path.join(folder, file)
-                        filename = file
-                        break
-                if file_path:
-                    break
+        ])
         
         if not file_path or not os.path.exists(file_path):
             return jsonify({'error': '文件不存在'}), 404
+        filename = os.path.basename(file_path)
         
+        # 页数取自上传时保存的元数据
+        if filename == f"{file_id}.pdf":
+            meta = get_or_inspect_meta(current_app.config['META_FOLDER'], file_id, file_path)
+        else:
+            meta = load_file_meta(current_app.config['META_FOLDER'], file_id) or inspect_pdf(file_path)
+
         # 返回文件信息和预览数据
         file_info = {
             'id': file_id,
             'name': filename,
             'size': os.path.getsize(file_path),
             'type': 'pdf',
-            'pages': 5,  # 模拟页数
+            'pages': meta['pages'],
+            'pageSizes': meta['pageSizes'],
             'previewUrl': f'/api/files/view/{file_id}'
         }
         
@@ -356,30 +557,15 @@ def preview_file(file_id):
 def view_file(file_id):
     """直接查看PDF文件"""
     try:
-        # 查找文件
-        folders = [
+        file_path = find_file(file_id, [
             current_app.config['UPLOAD_FOLDER'],
             current_app.config['PROCESSED_FOLDER']
-        ]
-        
-        file_path = None
-        
-        for folder in folders:
-            if os.path.exists(folder):
-                for file in os.listdir(folder):
-                    if file.startswith(file_id) or file_id in file:
-                        file_path = os.path.join(folder, file)
-                        break
-                if file_path:
-                    break
+        ])
         
         if not file_path or not os.path.exists(file_path):
             return jsonify({'error': '文件不存在'}), 404
         
-        return send_file(
-            file_path,
-            mimetype='application/pdf'
-        )
+        return deliver_file(file_path, mimetype='application/pdf')
         
     except Exception as e:
         return jsonify({'error': f'文件查看失败: {str(e)}'}), 500
@@ -469,14 +655,7 @@ def ai_seal_position():
     data = request.get_json()
     file_id = data.get('fileId')
     # 查找PDF路径
-    pdf_path = None
-    for folder in [current_app.config['PROCESSED_FOLDER'], current_app.config['UPLOAD_FOLDER']]:
-        for filename in os.listdir(folder):
-            if file_id in filename:
-                pdf_path = os.path.join(folder, filename)
-                break
-        if pdf_path:
-            break
+    pdf_path = find_file(file_id, [current_app.config['PROCESSED_FOLDER'], current_app.config['UPLOAD_FOLDER']])
     if not pdf_path or not os.path.exists(pdf_path):
         return jsonify({'success': False, 'message': 'PDF文件不存在'}), 404
 
@@ -484,10 +663,15 @@ def ai_seal_position():
     # 2. 调用智谱模型（如GLM-4）分析文本，返回推荐盖章位置
     # 3. 结合PDF坐标，返回 page, x, y
 
-    # 示例伪代码
-    from paddleocr import PaddleOCR
-    ocr = PaddleOCR(use_angle_cls=True, lang='ch')
-    result = ocr.ocr(pdf_path, cls=True)
+    # OCR 模型在首个请求时加载，之后进程内复用
+    try:
+        with span('ocr.load'):
+            get_ocr()
+    except OcrUnavailableError as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
+    with span('ocr'):
+        result = run_ocr(pdf_path, cls=True)
+    PAGES_PROCESSED.inc(len(result), stage='ocr')
     # 提取所有文本块
     text_blocks = []
     for page_idx, page in enumerate(result):
@@ -506,8 +690,9 @@ def ai_seal_position():
         "temperature": 0.2,
         "top_p": 0.8
     }
-    glm_res = requests.post(glm_api_url, json=glm_payload, headers={"Authorization": "Bearer YOUR_API_KEY"})
-    glm_data = glm_res.json()
+    with span('glm'):
+        glm_res = requests.post(glm_api_url, json=glm_payload, headers={"Authorization": "Bearer YOUR_API_KEY"})
+        glm_data = glm_res.json()
     # 假设返回 {'page': 2, 'x': 200, 'y': 350}
     position = glm_data.get('data', {}).get('position', None)
     if position:
@@ -0,0 +1,19 @@
+from flask import Blueprint, jsonify
+from src.utils import warmup
+
+health_bp = Blueprint('health', __name__)
+
+@health_bp.route('/live', methods=['GET'])
+def live():
+    """存活检查"""
+    return jsonify({'success': True})
+
+@health_bp.route('/ready', methods=['GET'])
+def ready():
+    """就绪检查：PDF 库预热完成后返回 200"""
+    is_ready, status = warmup.readiness()
+    return jsonify({
+        'success': is_ready,
+        'ready': is_ready,
+        'status': status
+    }), 200 if is_ready else 503
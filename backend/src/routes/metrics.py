@@ -0,0 +1,10 @@
+from flask import Blueprint, Response
+from src.utils import metrics as metrics_registry
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus 指标抓取接口（多进程模式下汇总所有 worker）"""
+    body, content_type = metrics_registry.render()
+    return Response(body, content_type=content_type)
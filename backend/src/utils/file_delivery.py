@@ -0,0 +1,126 @@
+"""PDF 文件下发
+
+通过 FILE_DELIVERY_MODE 配置下发方式：
+- 'sendfile'（默认）：后端直接返回文件对象，交给 WSGI 服务器的 wsgi.file_wrapper，
+  gunicorn 等服务器会走内核 sendfile，不经过 Python 拷贝数据
+- 'x-accel'：后端只负责查找与鉴权，通过 X-Accel-Redirect 交给 nginx 传输，
+  内部路径为 X_ACCEL_PREFIX + 目录名 + 文件名，nginx 示例：
+      location /protected/ {
+          internal;
+          alias /path/to/backend/src/;
+      }
+- 'x-sendfile'：同上，使用 X-Sendfile 头（Apache mod_xsendfile / lighttpd）
+- 'python'：旧逻辑，使用 Flask send_file
+
+以上方式均支持 Range 请求（代理模式下由前端代理处理）。
+"""
+import os
+from datetime import datetime, timezone
+from urllib.parse import quote
+from flask import Response, current_app, request, send_file
+from werkzeug.http import is_resource_modified
+from werkzeug.wsgi import wrap_file
+
+DELIVERY_MODES = ('sendfile', 'x-accel', 'x-sendfile', 'python')
+
+BLOCK_SIZE = 64 * 1024
+
+
+def is_within_folder(file_path, folder):
+    """文件解析后的真实路径是否位于指定目录内"""
+    real_folder = os.path.realpath(folder)
+    return os.path.commonpath([os.path.realpath(file_path), real_folder]) == real_folder
+
+
+def _content_disposition(filename, as_attachment):
+    disposition = 'attachment' if as_attachment else 'inline'
+    try:
+        filename.encode('ascii')
+    except UnicodeEncodeError:
+        # 中文文件名按 RFC 5987 编码，同时提供 ASCII 回退名
+        fallback = filename.encode('ascii', 'ignore').decode('ascii') or 'download.pdf'
+        return f"{disposition}; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
+    return f'{disposition}; filename="{filename}"'
+
+
+def _iter_range(file_obj, length):
+    """只读取区间内的字节"""
+    try:
+        while length > 0:
+            chunk = file_obj.read(min(BLOCK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file_obj.close()
+
+
+def _offload_response(file_path, mimetype, as_attachment, mode):
+    headers = {'Content-Disposition': _content_disposition(os.path.basename(file_path), as_attachment)}
+    if mode == 'x-accel':
+        folder_name = os.path.basename(os.path.dirname(file_path))
+        prefix = current_app.config['X_ACCEL_PREFIX'].rstrip('/')
+        headers['X-Accel-Redirect'] = f"{prefix}/{quote(folder_name)}/{quote(os.path.basename(file_path))}"
+    else:
+        headers['X-Sendfile'] = os.path.realpath(file_path)
+    return Response(status=200, mimetype=mimetype, headers=headers)
+
+
+def _sendfile_response(file_path, mimetype, as_attachment):
+    stat = os.stat(file_path)
+    file_size = stat.st_size
+    etag = f'{stat.st_mtime_ns:x}-{file_size:x}'
+    last_modified = datetime.fromtimestamp(int(stat.st_mtime), tz=timezone.utc)
+
+    headers = {
+        'Content-Disposition': _content_disposition(os.path.basename(file_path), as_attachment),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': 'no-cache'
+    }
+
+    if not is_resource_modified(request.environ, etag, last_modified=last_modified):
+        response = Response(status=304, headers=headers)
+        response.set_etag(etag)
+        return response
+
+    # If-Range 不匹配时按整文件返回；多区间请求同样按整文件返回
+    byte_range = None
+    if request.range and len(request.range.ranges) == 1 and (
+            'HTTP_IF_RANGE' not in request.environ or not is_resource_modified(
+                request.environ, etag, last_modified=last_modified, ignore_if_range=False)):
+        byte_range = request.range.range_for_length(file_size)
+        if byte_range is None:
+            headers['Content-Range'] = f'bytes */{file_size}'
+            return Response(status=416, headers=headers)
+
+    start, stop = byte_range if byte_range else (0, file_size)
+    file_obj = open(file_path, 'rb')
+    file_obj.seek(start)
+    if stop == file_size:
+        # 读到文件末尾：交给 wsgi.file_wrapper，服务器可直接 sendfile
+        body = wrap_file(request.environ, file_obj, BLOCK_SIZE)
+    else:
+        body = _iter_range(file_obj, stop - start)
+
+    response = Response(body, status=206 if byte_range else 200, mimetype=mimetype,
+                        headers=headers, direct_passthrough=True)
+    response.content_length = stop - start
+    if byte_range:
+        response.headers['Content-Range'] = f'bytes {start}-{stop - 1}/{file_size}'
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    return response
+
+
+def deliver_file(file_path, as_attachment=False, mimetype='application/pdf'):
+    """按配置的下发方式返回文件，调用方需已完成路径解析与鉴权"""
+    mode = current_app.config['FILE_DELIVERY_MODE']
+    if mode not in DELIVERY_MODES:
+        raise ValueError(f'未知的文件下发方式: {mode}')
+
+    if mode in ('x-accel', 'x-sendfile'):
+        return _offload_response(file_path, mimetype, as_attachment, mode)
+    if mode == 'sendfile':
+        return _sendfile_response(file_path, mimetype, as_attachment)
+    return send_file(file_path, mimetype=mimetype, as_attachment=as_attachment, conditional=True)
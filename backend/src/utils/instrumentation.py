@@ -0,0 +1,76 @@
+"""请求级指标与按需 cProfile 采样
+
+- 每个请求记录 esign_http_requests_total 与 esign_http_request_duration_seconds
+- PROFILING_ENABLED 开启后，带 PROFILE_HEADER 请求头（值为 1）的请求会被强制采样并保存；
+  另按 PROFILE_SAMPLE_RATE 随机采样，采样请求耗时超过 PROFILE_SLOW_MS 时保存
+- 结果保存到 PROFILE_DIR，可用 python -m pstats 或 snakeviz 查看
+"""
+import os
+import re
+import time
+import random
+import cProfile
+import threading
+from datetime import datetime
+from flask import g, request
+from src.utils.metrics import REQUEST_COUNT, REQUEST_LATENCY, PROFILES_DUMPED
+
+# cProfile 同一时刻只能有一个实例处于启用状态，采样请求串行化
+_profile_lock = threading.Lock()
+
+
+def _should_profile(app):
+    if not app.config['PROFILING_ENABLED']:
+        return False, False
+    forced = request.headers.get(app.config['PROFILE_HEADER']) == '1'
+    sampled = app.config['PROFILE_SAMPLE_RATE'] > 0 and random.random() < app.config['PROFILE_SAMPLE_RATE']
+    return forced or sampled, forced
+
+
+def _dump_profile(app, profiler, elapsed):
+    os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+    endpoint = re.sub(r'[^A-Za-z0-9_.-]', '_', request.endpoint or 'unknown')
+    filename = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{endpoint}-{int(elapsed * 1000)}ms.prof"
+    profiler.dump_stats(os.path.join(app.config['PROFILE_DIR'], filename))
+    PROFILES_DUMPED.inc()
+    return filename
+
+
+def init_app(app):
+    """注册请求计时与采样钩子"""
+
+    @app.before_request
+    def _start_request():
+        g.request_start = time.perf_counter()
+        g.profiler = None
+        should_profile, forced = _should_profile(app)
+        if should_profile and _profile_lock.acquire(blocking=False):
+            g.profiler = cProfile.Profile()
+            g.profile_forced = forced
+            g.profiler.enable()
+
+    @app.after_request
+    def _finish_request(response):
+        start = g.pop('request_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_COUNT.inc(method=request.method, endpoint=endpoint, status=str(response.status_code))
+        REQUEST_LATENCY.observe(elapsed, method=request.method, endpoint=endpoint)
+
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            _profile_lock.release()
+            if g.pop('profile_forced', False) or elapsed * 1000 >= app.config['PROFILE_SLOW_MS']:
+                response.headers['X-Profile-File'] = _dump_profile(app, profiler, elapsed)
+        return response
+
+    @app.teardown_request
+    def _release_profiler(exc):
+        # 请求异常未进入 after_request 时释放采样锁
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            _profile_lock.release()
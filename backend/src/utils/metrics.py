@@ -0,0 +1,110 @@
+"""指标与阶段计时
+
+基于 prometheus_client 提供 Counter / Histogram 与 Prometheus 文本格式输出，以及用于包裹处理阶段的 span()。
+
+多 worker 部署（gunicorn）时所有 worker 共用一个监听 socket，每次抓取只会落到其中一个 worker，
+因此使用 prometheus_client 的多进程模式：设置 PROMETHEUS_MULTIPROC_DIR 后各进程把指标写入该目录下
+各自的 mmap 文件，/metrics 抓取时汇总所有进程的数据。gunicorn.conf.py 负责设置该目录、启动时清空，
+并在 worker 退出时调用 mark_worker_dead()。未设置时（开发服务器、单进程）按进程内数据输出。
+"""
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import (
+    CollectorRegistry, CONTENT_TYPE_LATEST, Counter as _Counter, Histogram as _Histogram, generate_latest,
+    disable_created_metrics
+)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+MULTIPROC_DIR_ENV = 'PROMETHEUS_MULTIPROC_DIR'
+
+# 不输出 *_created 时间戳序列（多进程模式下本就不提供）
+disable_created_metrics()
+registry = CollectorRegistry()
+
+
+def _label_values(label_names, labels):
+    return tuple(str(labels.get(name, '')) for name in label_names)
+
+
+class Counter:
+    """单调递增计数器，标签以关键字参数传入，缺省标签记为空字符串"""
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.label_names = tuple(label_names)
+        self._metric = _Counter(name, documentation, self.label_names, registry=registry)
+
+    def inc(self, amount=1, **labels):
+        metric = self._metric.labels(*_label_values(self.label_names, labels)) if self.label_names else self._metric
+        metric.inc(amount)
+
+
+class Histogram:
+    """累积分桶直方图"""
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.label_names = tuple(label_names)
+        self._metric = _Histogram(name, documentation, self.label_names, buckets=buckets, registry=registry)
+
+    def observe(self, value, **labels):
+        metric = self._metric.labels(*_label_values(self.label_names, labels)) if self.label_names else self._metric
+        metric.observe(value)
+
+
+def multiprocess_enabled():
+    return bool(os.environ.get(MULTIPROC_DIR_ENV))
+
+
+def render():
+    """输出 Prometheus 文本格式，返回 (内容, Content-Type)；多进程模式下汇总所有 worker"""
+    if multiprocess_enabled():
+        from prometheus_client import multiprocess
+        collect_registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(collect_registry)
+        return generate_latest(collect_registry), CONTENT_TYPE_LATEST
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead(pid):
+    """worker 退出后清理其实时类指标文件（计数器与直方图数据保留并继续参与汇总）"""
+    if multiprocess_enabled():
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
+
+
+REQUEST_COUNT = Counter(
+    'esign_http_requests_total', 'HTTP 请求数', ('method', 'endpoint', 'status'))
+REQUEST_LATENCY = Histogram(
+    'esign_http_request_duration_seconds', 'HTTP 请求耗时（秒）', ('method', 'endpoint'))
+STAGE_LATENCY = Histogram(
+    'esign_stage_duration_seconds', '处理阶段耗时（秒）', ('stage',))
+STAGE_ERRORS = Counter(
+    'esign_stage_errors_total', '处理阶段异常次数', ('stage',))
+PAGES_PROCESSED = Counter(
+    'esign_pages_processed_total', '处理的 PDF 页数', ('stage',))
+BYTES_WRITTEN = Counter(
+    'esign_bytes_written_total', '写入磁盘的字节数', ('stage',))
+CACHE_REQUESTS = Counter(
+    'esign_cache_requests_total', '缓存查询次数，result 为 hit / miss', ('cache', 'result'))
+PROFILES_DUMPED = Counter(
+    'esign_profiles_dumped_total', '已保存的 cProfile 文件数')
+
+
+@contextmanager
+def span(stage):
+    """记录一个处理阶段的耗时，异常时同时计入 esign_stage_errors_total"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - start, stage=stage)
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
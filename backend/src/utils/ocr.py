@@ -0,0 +1,56 @@
+"""OCR 模型惰性加载
+
+paddle/paddleocr 为可选依赖（见 requirements-ocr.txt），
+仅在首个 OCR 请求到达时导入并初始化，之后在进程内复用。
+Paddle 预测器不是线程安全的，同一进程内的推理通过 run_ocr() 串行执行。
+"""
+import importlib.util
+import threading
+
+_ocr = None
+_ocr_lock = threading.Lock()
+_infer_lock = threading.Lock()
+_status = {'state': 'not_loaded', 'error': None}
+
+
+class OcrUnavailableError(RuntimeError):
+    """OCR 依赖未安装或模型加载失败"""
+
+
+def is_available():
+    """paddleocr 是否已安装（不导入模块）"""
+    return importlib.util.find_spec('paddleocr') is not None
+
+
+def get_ocr():
+    """获取进程内共享的 PaddleOCR 实例"""
+    global _ocr
+    if _ocr is not None:
+        return _ocr
+    with _ocr_lock:
+        if _ocr is None:
+            if not is_available():
+                _status['state'] = 'unavailable'
+                raise OcrUnavailableError('未安装OCR依赖，请安装 requirements-ocr.txt')
+            _status['state'] = 'loading'
+            try:
+                from paddleocr import PaddleOCR
+                _ocr = PaddleOCR(use_angle_cls=True, lang='ch')
+            except Exception as e:
+                _status['state'] = 'failed'
+                _status['error'] = str(e)
+                raise OcrUnavailableError(f'OCR模型加载失败: {str(e)}')
+            _status['state'] = 'ready'
+    return _ocr
+
+
+def run_ocr(pdf_path, cls=True):
+    """对文件执行 OCR，多线程 worker 中的并发请求在此排队"""
+    ocr = get_ocr()
+    with _infer_lock:
+        return ocr.ocr(pdf_path, cls=cls)
+
+
+def status():
+    """OCR 加载状态：not_loaded / loading / ready / failed / unavailable"""
+    return _status['state']
@@ -0,0 +1,186 @@
+"""PDF 校验与元数据提取
+
+上传时在线程池中并发完成结构检查（文件头、xref、%%EOF）、加密检测、
+页数与页面尺寸提取，并把结果持久化到元数据目录，后续合并/签章/预览
+直接读取，不再重复解析 PDF。
+
+只有缺少 %PDF- 文件头或 PyPDF2 无法解析时才拒绝文件；尾部 startxref 缺失或偏移不准
+（扫描件中常见）交给 PyPDF2 自行修复，与合并时使用的解析器保持一致。
+"""
+import os
+import re
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from src.utils.metrics import record_cache
+
+# 文件头需出现在前 1024 字节内；尾部信息从最后 2048 字节开始向前扩大查找，最多 1MB
+HEADER_SCAN_BYTES = 1024
+TRAILER_SCAN_BYTES = 2048
+TRAILER_MAX_SCAN_BYTES = 1024 * 1024
+
+_STARTXREF_RE = re.compile(rb'startxref\s+(\d+)\s+%%EOF')
+_VERSION_RE = re.compile(rb'%PDF-(\d\.\d)')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# 进程内元数据缓存（LRU），超出容量时淘汰最久未使用的条目，磁盘 JSON 仍为准
+META_CACHE_SIZE = 512
+_meta_cache = OrderedDict()
+_meta_lock = threading.Lock()
+
+
+class PdfValidationError(ValueError):
+    """PDF 文件未通过校验"""
+
+
+def get_executor(max_workers=4):
+    """获取共享的校验线程池（按进程惰性创建）"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pdf-validate')
+    return _executor
+
+
+def read_startxref(f, file_size):
+    """读取文件末尾最后一个 startxref 偏移，缺失时返回 None
+
+    文件尾可能带有填充字节，查找窗口从 TRAILER_SCAN_BYTES 起逐步翻倍，直到 TRAILER_MAX_SCAN_BYTES。
+    """
+    window = TRAILER_SCAN_BYTES
+    while True:
+        window = min(window, file_size, TRAILER_MAX_SCAN_BYTES)
+        f.seek(file_size - window)
+        xref_matches = list(_STARTXREF_RE.finditer(f.read(window)))
+        if xref_matches:
+            return int(xref_matches[-1].group(1))
+        if window >= min(file_size, TRAILER_MAX_SCAN_BYTES):
+            return None
+        window *= 2
+
+
+def check_structure(file_path):
+    """检查文件头并定位交叉引用表，返回 (PDF 版本号, 交叉引用表是否可直接定位)
+
+    交叉引用表无法定位时不直接拒绝，由调用方交给解析器判断。
+    """
+    file_size = os.path.getsize(file_path)
+    if file_size == 0:
+        raise PdfValidationError('文件为空')
+
+    with open(file_path, 'rb') as f:
+        head = f.read(HEADER_SCAN_BYTES)
+        version_match = _VERSION_RE.search(head)
+        if not version_match:
+            raise PdfValidationError('文件头缺失，不是有效的PDF文件')
+
+        xref_offset = read_startxref(f, file_size)
+        xref_ok = False
+        if xref_offset is not None and xref_offset < file_size:
+            # 偏移处应为传统 xref 表或 xref 流对象（"n g obj"）
+            f.seek(xref_offset)
+            xref_head = f.read(32).lstrip()
+            xref_ok = xref_head.startswith(b'xref') or re.match(rb'\d+\s+\d+\s+obj', xref_head) is not None
+
+    return version_match.group(1).decode('ascii'), xref_ok
+
+
+def inspect_pdf(file_path):
+    """校验 PDF 并提取页数、页面尺寸等元数据"""
+    version, xref_ok = check_structure(file_path)
+
+    from PyPDF2 import PdfReader
+    try:
+        reader = PdfReader(file_path)
+        if reader.is_encrypted:
+            raise PdfValidationError('不支持加密的PDF文件，请先解除密码保护')
+        page_sizes = []
+        for page in reader.pages:
+            box = page.mediabox
+            page_sizes.append({
+                'width': round(float(box.width), 2),
+                'height': round(float(box.height), 2),
+                'rotation': int(page.get('/Rotate', 0) or 0)
+            })
+    except PdfValidationError:
+        raise
+    except Exception as e:
+        if not xref_ok:
+            raise PdfValidationError(f'文件不完整或交叉引用表损坏，可能已被截断: {str(e)}')
+        raise PdfValidationError(f'PDF解析失败: {str(e)}')
+
+    if not page_sizes:
+        raise PdfValidationError('PDF文件不包含任何页面')
+
+    return {
+        'pdfVersion': version,
+        'pages': len(page_sizes),
+        'pageSizes': page_sizes,
+        'encrypted': False
+    }
+
+
+def save_and_inspect(file_storage, file_path):
+    """保存上传文件并校验，校验失败时删除已保存的文件"""
+    file_storage.save(file_path)
+    try:
+        meta = inspect_pdf(file_path)
+    except Exception:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    meta['size'] = os.path.getsize(file_path)
+    return meta
+
+
+def _cache_put(file_id, meta):
+    with _meta_lock:
+        _meta_cache[file_id] = meta
+        _meta_cache.move_to_end(file_id)
+        while len(_meta_cache) > META_CACHE_SIZE:
+            _meta_cache.popitem(last=False)
+
+
+def save_file_meta(meta_folder, file_id, meta):
+    """持久化文件元数据（JSON），同时写入进程内缓存"""
+    os.makedirs(meta_folder, exist_ok=True)
+    meta_path = os.path.join(meta_folder, f"{file_id}.json")
+    tmp_path = f"{meta_path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, meta_path)
+    _cache_put(file_id, meta)
+    return meta
+
+
+def load_file_meta(meta_folder, file_id):
+    """读取文件元数据，不存在时返回 None"""
+    with _meta_lock:
+        meta = _meta_cache.get(file_id)
+        if meta is not None:
+            _meta_cache.move_to_end(file_id)
+    record_cache('file_meta', meta is not None)
+    if meta is not None:
+        return meta
+
+    meta_path = os.path.join(meta_folder, f"{file_id}.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    _cache_put(file_id, meta)
+    return meta
+
+
+def get_or_inspect_meta(meta_folder, file_id, file_path):
+    """优先读取已存元数据，历史文件没有元数据时解析一次并保存"""
+    meta = load_file_meta(meta_folder, file_id)
+    if meta is None:
+        meta = inspect_pdf(file_path)
+        meta['size'] = os.path.getsize(file_path)
+        save_file_meta(meta_folder, file_id, meta)
+    return meta
@@ -0,0 +1,439 @@
+"""PDF 数字签名（PKCS#7 / CMS detached）
+
+在已加盖可视印章的 PDF 末尾以增量更新方式追加签名域：
+- 签名字典 /ByteRange 覆盖除 /Contents 以外的全部字节，/SubFilter 为 adbe.pkcs7.detached
+- 摘要按 ByteRange 分块流式计算，不把整个文件读入内存
+- 私钥与证书链解析结果按 (路径, 修改时间) 缓存，跨请求复用
+- sign_batch() 使用进程池批量签署，每个子进程各自缓存已解析的密钥
+
+只支持传统 xref 表或 xref 流的未加密 PDF，增量部分统一使用传统 xref 表。
+
+生成自签名测试证书（在 backend 目录下运行）：
+    python -m src.utils.pdf_sign gen-test-cert ./certs
+"""
+import os
+import re
+import sys
+import shutil
+import hashlib
+import tempfile
+import threading
+import multiprocessing
+from io import BytesIO
+from datetime import datetime, timezone, timedelta
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from src.utils.metrics import span
+from src.utils.pdf_meta import read_startxref
+
+# /Contents 预留字节数（十六进制编码后占用两倍长度），需容纳签名与完整证书链
+DEFAULT_CONTENTS_SIZE = 8192
+HASH_CHUNK_SIZE = 1024 * 1024
+# 批量签名进程数上限：每个 WSGI worker 各有一个进程池，默认保持很小
+DEFAULT_BATCH_WORKERS = 2
+
+BYTE_RANGE_PLACEHOLDER = b'/ByteRange [0 ********** ********** **********]'
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class PdfSignError(RuntimeError):
+    """签名失败"""
+
+
+class SignerConfigError(PdfSignError):
+    """签名证书、私钥或服务端签名配置有误，与待签文件无关"""
+
+
+class Signer:
+    """已解析的私钥与证书链"""
+
+    def __init__(self, private_key, certificate, chain):
+        from asn1crypto import x509 as asn1_x509
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa, ec
+
+        def to_asn1(cert):
+            return asn1_x509.Certificate.load(cert.public_bytes(serialization.Encoding.DER))
+
+        if isinstance(private_key, rsa.RSAPrivateKey):
+            self.signature_algorithm = 'sha256_rsa'
+        elif isinstance(private_key, ec.EllipticCurvePrivateKey):
+            self.signature_algorithm = 'sha256_ecdsa'
+        else:
+            raise SignerConfigError('仅支持 RSA 或 EC 私钥')
+
+        self.private_key = private_key
+        self.certificate = to_asn1(certificate)
+        self.chain = [to_asn1(cert) for cert in chain]
+        self.subject_name = self.certificate.subject.human_friendly
+
+    def sign(self, data):
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import padding, ec
+        if self.signature_algorithm == 'sha256_rsa':
+            return self.private_key.sign(data, padding.PKCS1v15(), hashes.SHA256())
+        return self.private_key.sign(data, ec.ECDSA(hashes.SHA256()))
+
+
+def _mtime(path):
+    return os.path.getmtime(path) if path else None
+
+
+@lru_cache(maxsize=8)
+def _load_signer(key_path, key_mtime, cert_path, cert_mtime, chain_path, chain_mtime, password):
+    from cryptography import x509
+    from cryptography.hazmat.primitives import serialization
+
+    with open(key_path, 'rb') as f:
+        key_data = f.read()
+    with open(cert_path, 'rb') as f:
+        cert_data = f.read()
+    password_bytes = password.encode('utf-8') if password else None
+    if b'-----BEGIN' in key_data:
+        private_key = serialization.load_pem_private_key(key_data, password_bytes)
+    else:
+        private_key = serialization.load_der_private_key(key_data, password_bytes)
+    if b'-----BEGIN' in cert_data:
+        certificate = x509.load_pem_x509_certificate(cert_data)
+    else:
+        certificate = x509.load_der_x509_certificate(cert_data)
+
+    chain = []
+    if chain_path:
+        with open(chain_path, 'rb') as f:
+            chain = x509.load_pem_x509_certificates(f.read())
+    return Signer(private_key, certificate, chain)
+
+
+def get_signer(key_path, cert_path, chain_path=None, password=None):
+    """获取已解析的签名者，文件修改后自动重新加载"""
+    try:
+        return _load_signer(key_path, _mtime(key_path), cert_path, _mtime(cert_path),
+                            chain_path, _mtime(chain_path), password)
+    except PdfSignError:
+        raise
+    except (OSError, ValueError, TypeError) as e:
+        # 文件缺失、私钥密码错误、证书格式错误等
+        raise SignerConfigError(f'签名证书加载失败: {str(e)}') from e
+
+
+def _serialize(obj):
+    stream = BytesIO()
+    obj.write_to_stream(stream, None)
+    return stream.getvalue()
+
+
+def _pdf_date(moment):
+    return moment.strftime("D:%Y%m%d%H%M%S+00'00'")
+
+
+def _build_cms(signer, digest, signing_time):
+    from asn1crypto import cms, algos, core
+
+    signed_attrs = cms.CMSAttributes([
+        cms.CMSAttribute({'type': 'content_type', 'values': ['data']}),
+        cms.CMSAttribute({'type': 'signing_time', 'values': [cms.Time({'utc_time': core.UTCTime(signing_time)})]}),
+        cms.CMSAttribute({'type': 'message_digest', 'values': [digest]}),
+    ])
+    signature = signer.sign(signed_attrs.dump())
+
+    signer_info = cms.SignerInfo({
+        'version': 'v1',
+        'sid': cms.SignerIdentifier({
+            'issuer_and_serial_number': cms.IssuerAndSerialNumber({
+                'issuer': signer.certificate.issuer,
+                'serial_number': signer.certificate.serial_number
+            })
+        }),
+        'digest_algorithm': algos.DigestAlgorithm({'algorithm': 'sha256'}),
+        'signed_attrs': signed_attrs,
+        'signature_algorithm': algos.SignedDigestAlgorithm({'algorithm': signer.signature_algorithm}),
+        'signature': signature
+    })
+    signed_data = cms.SignedData({
+        'version': 'v1',
+        'digest_algorithms': [algos.DigestAlgorithm({'algorithm': 'sha256'})],
+        'encap_content_info': {'content_type': 'data'},
+        'certificates': [signer.certificate] + signer.chain,
+        'signer_infos': [signer_info]
+    })
+    return cms.ContentInfo({'content_type': 'signed_data', 'content': signed_data}).dump()
+
+
+def _hash_byte_ranges(f, byte_range):
+    """按 ByteRange 分块计算 SHA-256"""
+    digest = hashlib.sha256()
+    for start, length in zip(byte_range[0::2], byte_range[1::2]):
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(HASH_CHUNK_SIZE, remaining))
+            if not chunk:
+                raise PdfSignError('读取签名字节范围失败，文件被截断')
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.digest()
+
+
+def _xref_section(offsets):
+    """生成只包含本次写入对象的传统 xref 表"""
+    lines = [b'xref\n']
+    ids = sorted(offsets)
+    start = 0
+    while start < len(ids):
+        end = start
+        while end + 1 < len(ids) and ids[end + 1] == ids[end] + 1:
+            end += 1
+        lines.append(f'{ids[start]} {end - start + 1}\n'.encode('ascii'))
+        for obj_id in ids[start:end + 1]:
+            offset, generation = offsets[obj_id]
+            lines.append(f'{offset:010d} {generation:05d} n\r\n'.encode('ascii'))
+        start = end + 1
+    return b''.join(lines)
+
+
+def _xref_stream_size(reader, f, xref_offset):
+    """PyPDF2 读取 xref 流时不保留 /Size，从 xref 流对象字典中读取；xref 流自身的对象号也需计入"""
+    f.seek(xref_offset)
+    head = f.read(4096)
+    candidates = [obj_id + 1 for entries in reader.xref.values() for obj_id in entries]
+    candidates.extend(obj_id + 1 for obj_id in reader.xref_objStm)
+    obj_match = re.match(rb'\s*(\d+)\s+\d+\s+obj', head)
+    if obj_match:
+        candidates.append(int(obj_match.group(1)) + 1)
+    size_match = re.search(rb'/Size\s+(\d+)', head)
+    if size_match:
+        candidates.append(int(size_match.group(1)))
+    return max(candidates)
+
+
+def _append_signature_field(f, file_size, page_index, contents_size, reason, location, signer_name, signing_time):
+    """在文件末尾追加签名字典、签名域、更新后的页面与目录，返回 /Contents 占位符区间"""
+    from PyPDF2 import PdfReader
+    from PyPDF2.generic import (
+        ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject, TextStringObject
+    )
+
+    f.seek(0)
+    reader = PdfReader(f)
+    trailer = reader.trailer
+    if '/Encrypt' in trailer:
+        raise PdfSignError('不支持对加密的PDF签名')
+    prev_xref = read_startxref(f, file_size)
+    if prev_xref is None:
+        raise PdfSignError('未找到 startxref，文件可能已损坏')
+    if page_index < 0 or page_index >= len(reader.pages):
+        raise PdfSignError(f'签名页码超出范围，当前文档共 {len(reader.pages)} 页')
+
+    root_ref = trailer.raw_get('/Root')
+    root = reader.trailer['/Root']
+    page = reader.pages[page_index]
+    page_ref = page.indirect_reference
+
+    # 合并已有 AcroForm 字段，签名域名称按已有签名数量递增
+    acroform_ref = root.raw_get('/AcroForm') if '/AcroForm' in root else None
+    acroform = DictionaryObject()
+    if acroform_ref is not None:
+        acroform.update(dict.items(acroform_ref.get_object()))
+    fields = list(acroform['/Fields']) if '/Fields' in acroform else []
+    existing_signatures = sum(1 for field in fields if field.get_object().get('/FT') == '/Sig')
+
+    next_id = int(trailer['/Size']) if '/Size' in trailer else _xref_stream_size(reader, f, prev_xref)
+    sig_id, widget_id = next_id, next_id + 1
+    sig_ref = IndirectObject(sig_id, 0, reader)
+    widget_ref = IndirectObject(widget_id, 0, reader)
+
+    fields.append(widget_ref)
+    acroform[NameObject('/Fields')] = ArrayObject(fields)
+    acroform[NameObject('/SigFlags')] = NumberObject(3)
+
+    new_root = DictionaryObject()
+    new_root.update(dict.items(root))
+    new_page = DictionaryObject()
+    new_page.update(dict.items(page))
+    annots = list(page['/Annots']) if '/Annots' in page else []
+    new_page[NameObject('/Annots')] = ArrayObject(annots + [widget_ref])
+
+    widget = DictionaryObject({
+        NameObject('/Type'): NameObject('/Annot'),
+        NameObject('/Subtype'): NameObject('/Widget'),
+        NameObject('/FT'): NameObject('/Sig'),
+        NameObject('/T'): TextStringObject(f'Signature{existing_signatures + 1}'),
+        NameObject('/V'): sig_ref,
+        NameObject('/F'): NumberObject(132),
+        NameObject('/Rect'): ArrayObject([NumberObject(0)] * 4),
+        NameObject('/P'): page_ref
+    })
+
+    sig_entries = [
+        b'/Type /Sig /Filter /Adobe.PPKLite /SubFilter /adbe.pkcs7.detached ',
+        b'/M ' + _serialize(TextStringObject(_pdf_date(signing_time))) + b' ',
+        b'/Name ' + _serialize(TextStringObject(signer_name)) + b' '
+    ]
+    if reason:
+        sig_entries.append(b'/Reason ' + _serialize(TextStringObject(reason)) + b' ')
+    if location:
+        sig_entries.append(b'/Location ' + _serialize(TextStringObject(location)) + b' ')
+
+    f.seek(file_size)
+    offsets = {}
+    f.write(b'\n')
+
+    offsets[sig_id] = (f.tell(), 0)
+    f.write(f'{sig_id} 0 obj\n<<'.encode('ascii') + b''.join(sig_entries))
+    byte_range_offset = f.tell()
+    f.write(BYTE_RANGE_PLACEHOLDER + b' /Contents ')
+    contents_start = f.tell()
+    f.write(b'<' + b'0' * (contents_size * 2) + b'>')
+    contents_end = f.tell()
+    f.write(b'>>\nendobj\n')
+
+    objects = [(widget_id, 0, widget), (page_ref.idnum, page_ref.generation, new_page)]
+    if isinstance(acroform_ref, IndirectObject):
+        objects.append((acroform_ref.idnum, acroform_ref.generation, acroform))
+    else:
+        new_root[NameObject('/AcroForm')] = acroform
+    objects.append((root_ref.idnum, root_ref.generation, new_root))
+    for obj_id, generation, obj in objects:
+        offsets[obj_id] = (f.tell(), generation)
+        f.write(f'{obj_id} {generation} obj\n'.encode('ascii') + _serialize(obj) + b'\nendobj\n')
+
+    xref_offset = f.tell()
+    new_trailer = DictionaryObject({
+        NameObject('/Size'): NumberObject(next_id + 2),
+        NameObject('/Root'): root_ref,
+        NameObject('/Prev'): NumberObject(prev_xref)
+    })
+    for key in ('/Info', '/ID'):
+        if key in trailer:
+            new_trailer[NameObject(key)] = trailer.raw_get(key)
+    f.write(_xref_section(offsets))
+    f.write(b'trailer\n' + _serialize(new_trailer) + f'\nstartxref\n{xref_offset}\n%%EOF\n'.encode('ascii'))
+    return byte_range_offset, contents_start, contents_end
+
+
+def sign_pdf(input_path, output_path, signer, page=1, reason=None, location=None,
+             contents_size=DEFAULT_CONTENTS_SIZE, signing_time=None):
+    """对 PDF 追加 PKCS#7 数字签名，input_path 与 output_path 可以相同"""
+    signing_time = signing_time or datetime.now(timezone.utc)
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.sign-', suffix='.tmp', dir=output_dir)
+    os.close(fd)
+    try:
+        shutil.copyfile(input_path, tmp_path)
+        with open(tmp_path, 'r+b') as f:
+            file_size = os.fstat(f.fileno()).st_size
+            byte_range_offset, contents_start, contents_end = _append_signature_field(
+                f, file_size, page - 1, contents_size, reason, location, signer.subject_name, signing_time)
+            total_size = f.tell()
+
+            byte_range = [0, contents_start, contents_end, total_size - contents_end]
+            byte_range_text = ('/ByteRange [%d %d %d %d]' % tuple(byte_range)).encode('ascii')
+            f.seek(byte_range_offset)
+            f.write(byte_range_text.ljust(len(BYTE_RANGE_PLACEHOLDER), b' '))
+            f.flush()
+
+            with span('sign.hash'):
+                digest = _hash_byte_ranges(f, byte_range)
+            with span('sign.cms'):
+                signature = _build_cms(signer, digest, signing_time).hex().encode('ascii')
+            if len(signature) > contents_size * 2:
+                raise SignerConfigError(f'签名数据 {len(signature) // 2} 字节超过预留的 {contents_size} 字节')
+            f.seek(contents_start + 1)
+            f.write(signature)
+        os.replace(tmp_path, output_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return {
+        'signer': signer.subject_name,
+        'signedAt': signing_time.isoformat(),
+        'byteRange': byte_range,
+        'digest': digest.hex()
+    }
+
+
+def _sign_job(input_path, output_path, signer_args, options):
+    """进程池任务：子进程内缓存已解析的签名者"""
+    try:
+        result = sign_pdf(input_path, output_path, get_signer(*signer_args), **options)
+        return {'input': input_path, 'output': output_path, 'success': True, **result}
+    except Exception as e:
+        return {'input': input_path, 'output': output_path, 'success': False, 'error': str(e)}
+
+
+def get_pool(max_workers=None):
+    """获取共享的签名进程池（spawn 方式启动，避免在多线程 worker 中 fork），子进程按需启动"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=max_workers or DEFAULT_BATCH_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+def shutdown_pool():
+    """关闭签名进程池，供 worker 退出时调用"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def sign_batch(jobs, signer_args, max_workers=None, **options):
+    """批量签名，jobs 为 (输入路径, 输出路径) 列表，按输入顺序返回每个文件的结果"""
+    pool = get_pool(max_workers)
+    futures = [pool.submit(_sign_job, input_path, output_path, tuple(signer_args), options)
+               for input_path, output_path in jobs]
+    return [future.result() for future in futures]
+
+
+def generate_test_certificate(out_dir, common_name='ESignSys Test Signer', days=365):
+    """生成自签名测试证书与私钥（key.pem / cert.pem），仅用于测试"""
+    from cryptography import x509
+    from cryptography.x509.oid import NameOID, ExtendedKeyUsageOID
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    os.makedirs(out_dir, exist_ok=True)
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([
+        x509.NameAttribute(NameOID.COMMON_NAME, common_name),
+        x509.NameAttribute(NameOID.ORGANIZATION_NAME, 'ESignSys Test')
+    ])
+    now = datetime.now(timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(minutes=5))
+        .not_valid_after(now + timedelta(days=days))
+        .add_extension(x509.KeyUsage(
+            digital_signature=True, content_commitment=True, key_encipherment=False, data_encipherment=False,
+            key_agreement=False, key_cert_sign=False, crl_sign=False, encipher_only=False, decipher_only=False
+        ), critical=True)
+        .add_extension(x509.ExtendedKeyUsage([ExtendedKeyUsageOID.EMAIL_PROTECTION]), critical=False)
+        .sign(key, hashes.SHA256())
+    )
+    key_path = os.path.join(out_dir, 'key.pem')
+    cert_path = os.path.join(out_dir, 'cert.pem')
+    with open(key_path, 'wb') as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    with open(cert_path, 'wb') as f:
+        f.write(certificate.public_bytes(serialization.Encoding.PEM))
+    return key_path, cert_path
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3 or sys.argv[1] != 'gen-test-cert':
+        print('用法: python -m src.utils.pdf_sign gen-test-cert <输出目录>')
+        sys.exit(1)
+    print('\n'.join(generate_test_certificate(sys.argv[2])))
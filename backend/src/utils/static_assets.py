@@ -0,0 +1,210 @@
+"""前端静态资源服务
+
+启动时扫描 static 目录建立内存清单：
+- 只收录 index.html 引用（含被引用 bundle 再引用）的 assets/ 文件，历史遗留 bundle 不再对外提供
+- Vite 输出的带内容哈希文件名使用长期 immutable 缓存，index.html 每次协商缓存
+- 文本类资源的 gzip / br 版本优先读取构建时生成的 .gz / .br 文件，缺失时在首次请求时压缩并缓存，
+  按 Accept-Encoding 直接返回；启动时不做压缩，避免拖慢每个 worker 的冷启动
+
+构建后生成高压缩率的预压缩文件（在 backend 目录下运行）：
+    python -m src.utils.static_assets precompress src/static
+"""
+import os
+import re
+import sys
+import gzip
+import threading
+import hashlib
+import mimetypes
+from flask import Response, request
+from src.utils.metrics import record_cache
+
+try:
+    import brotli
+except ImportError:  # 可选依赖，未安装时只提供 gzip
+    brotli = None
+
+ASSETS_DIR = 'assets'
+INDEX_FILE = 'index.html'
+
+# Vite 默认输出格式：name-<8位哈希>.ext
+HASHED_NAME_RE = re.compile(r'-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$')
+
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml', 'image/x-icon',
+                      'image/vnd.microsoft.icon')
+MIN_COMPRESS_SIZE = 1024
+# 运行时按需压缩使用较低的 br 级别，构建时预压缩使用最高级别
+RUNTIME_BROTLI_QUALITY = 5
+BUILD_BROTLI_QUALITY = 11
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+
+def _compress(content, encoding, brotli_quality):
+    if encoding == 'br':
+        return brotli.compress(content, quality=brotli_quality)
+    return gzip.compress(content, compresslevel=9, mtime=0)
+
+
+def _is_compressible(mimetype, size):
+    return size >= MIN_COMPRESS_SIZE and mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+class StaticAsset:
+    """单个静态文件的内容、缓存头与压缩版本"""
+
+    def __init__(self, rel_path, abs_path, brotli_quality=RUNTIME_BROTLI_QUALITY):
+        self.rel_path = rel_path
+        with open(abs_path, 'rb') as f:
+            self.content = f.read()
+        self.mimetype = mimetypes.guess_type(rel_path)[0] or 'application/octet-stream'
+        self.last_modified = int(os.path.getmtime(abs_path))
+        self.etag = hashlib.sha1(self.content).hexdigest()[:16]
+        is_hashed = rel_path.startswith(f'{ASSETS_DIR}/') and HASHED_NAME_RE.search(rel_path) is not None
+        self.cache_control = IMMUTABLE_CACHE_CONTROL if is_hashed else REVALIDATE_CACHE_CONTROL
+        self.brotli_quality = brotli_quality
+        self.compressible = _is_compressible(self.mimetype, len(self.content))
+
+        # 编码 -> 压缩后内容，None 表示压缩后不比原文件小
+        self.variants = {}
+        self._variants_lock = threading.Lock()
+        if self.compressible:
+            for encoding, suffix in ENCODING_SUFFIXES.items():
+                # 只采用不早于源文件的构建产物，避免返回过期内容
+                sidecar = abs_path + suffix
+                if os.path.exists(sidecar) and os.path.getmtime(sidecar) >= os.path.getmtime(abs_path):
+                    with open(sidecar, 'rb') as f:
+                        data = f.read()
+                    self.variants[encoding] = data if len(data) < len(self.content) else None
+
+    def get_variant(self, encoding):
+        """返回压缩版本，没有构建产物时在首次请求时压缩并缓存"""
+        if not self.compressible or (encoding == 'br' and brotli is None):
+            return None
+        if encoding in self.variants:
+            record_cache('static_compress', True)
+            return self.variants[encoding]
+        with self._variants_lock:
+            if encoding not in self.variants:
+                record_cache('static_compress', False)
+                data = _compress(self.content, encoding, self.brotli_quality)
+                self.variants[encoding] = data if len(data) < len(self.content) else None
+        return self.variants[encoding]
+
+    def choose_encoding(self, accept_encodings):
+        """按客户端 Accept-Encoding 选择压缩版本，br 优先"""
+        for encoding in ('br', 'gzip'):
+            if accept_encodings[encoding] > 0 and self.get_variant(encoding) is not None:
+                return encoding
+        return None
+
+    def make_response(self):
+        encoding = self.choose_encoding(request.accept_encodings)
+        body = self.variants[encoding] if encoding else self.content
+        response = Response(body, mimetype=self.mimetype)
+        response.headers['Cache-Control'] = self.cache_control
+        response.last_modified = self.last_modified
+        if self.compressible:
+            response.vary.add('Accept-Encoding')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+            response.set_etag(f'{self.etag}-{encoding}')
+        else:
+            response.set_etag(self.etag)
+        return response.make_conditional(request, accept_ranges=encoding is None)
+
+
+def _referenced_assets(static_folder):
+    """从 index.html 出发，找出所有被引用的 assets/ 文件（包括 bundle 内的再引用）"""
+    assets_folder = os.path.join(static_folder, ASSETS_DIR)
+    if not os.path.isdir(assets_folder):
+        return set()
+    candidates = [name for name in os.listdir(assets_folder) if os.path.isfile(os.path.join(assets_folder, name))]
+
+    index_path = os.path.join(static_folder, INDEX_FILE)
+    if not os.path.exists(index_path):
+        # 没有入口页面时无法判断引用关系，全部保留
+        return set(candidates)
+
+    referenced = set()
+    pending = [index_path]
+    while pending:
+        with open(pending.pop(), 'r', encoding='utf-8', errors='ignore') as f:
+            text = f.read()
+        for name in candidates:
+            if name not in referenced and name in text:
+                referenced.add(name)
+                if name.endswith(('.js', '.mjs', '.css')):
+                    pending.append(os.path.join(assets_folder, name))
+    return referenced
+
+
+class StaticManifest:
+    """静态资源内存清单"""
+
+    def __init__(self, static_folder, brotli_quality=RUNTIME_BROTLI_QUALITY):
+        self.static_folder = static_folder
+        self.assets = {}
+        self.skipped = []
+
+        referenced = _referenced_assets(static_folder)
+        for root, _, files in os.walk(static_folder):
+            for name in files:
+                abs_path = os.path.join(root, name)
+                rel_path = os.path.relpath(abs_path, static_folder).replace(os.sep, '/')
+                if rel_path.endswith(('.gz', '.br')):
+                    continue
+                if rel_path.startswith(f'{ASSETS_DIR}/') and name not in referenced:
+                    self.skipped.append(rel_path)
+                    continue
+                self.assets[rel_path] = StaticAsset(rel_path, abs_path, brotli_quality)
+
+    def get(self, path):
+        return self.assets.get(path)
+
+    def serve(self, path):
+        """返回静态文件；前端路由路径回退到 index.html，缺失或已跳过的 assets/ 文件返回 404"""
+        asset = self.assets.get(path or INDEX_FILE)
+        record_cache('static_manifest', asset is not None)
+        if asset is None:
+            if path.startswith(f'{ASSETS_DIR}/'):
+                return "Not found", 404
+            asset = self.assets.get(INDEX_FILE)
+            if asset is None:
+                return "index.html not found", 404
+        return asset.make_response()
+
+
+def precompress(static_folder, brotli_quality=BUILD_BROTLI_QUALITY):
+    """为清单收录的可压缩文件生成 .gz / .br，返回写入的文件路径"""
+    written = []
+    referenced = _referenced_assets(static_folder)
+    for root, _, files in os.walk(static_folder):
+        for name in files:
+            abs_path = os.path.join(root, name)
+            rel_path = os.path.relpath(abs_path, static_folder).replace(os.sep, '/')
+            if rel_path.endswith(('.gz', '.br')):
+                continue
+            if rel_path.startswith(f'{ASSETS_DIR}/') and name not in referenced:
+                continue
+            mimetype = mimetypes.guess_type(rel_path)[0] or 'application/octet-stream'
+            if not _is_compressible(mimetype, os.path.getsize(abs_path)):
+                continue
+            with open(abs_path, 'rb') as f:
+                content = f.read()
+            for encoding, suffix in ENCODING_SUFFIXES.items():
+                if encoding == 'br' and brotli is None:
+                    continue
+                with open(abs_path + suffix, 'wb') as f:
+                    f.write(_compress(content, encoding, brotli_quality))
+                written.append(abs_path + suffix)
+    return written
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3 or sys.argv[1] != 'precompress':
+        print('用法: python -m src.utils.static_assets precompress <静态资源目录>')
+        sys.exit(1)
+    print('\n'.join(precompress(sys.argv[2])))
@@ -0,0 +1,80 @@
+"""启动预热与就绪状态
+
+PDF 库（PyPDF2、reportlab）在预加载模式下于 fork 前同步加载，
+否则由 worker 在后台线程中加载；OCR 模型只在首个 OCR 请求到达时加载。
+
+后台预热线程只在 worker 进程中启动：gunicorn 下由 post_fork 钩子启动（见 gunicorn.conf.py），
+主进程中从不启动，避免 fork 时子进程继承持有中的导入锁或停在 loading 的状态。
+预热按进程号记录，状态来自父进程（fork 继承）时会在当前进程重新预热。
+"""
+import os
+import sys
+import threading
+import time
+
+_state = {
+    'pdf': 'not_loaded',  # not_loaded / loading / ready / failed
+    'pdfLoadedAt': None,
+    'error': None
+}
+_state_lock = threading.Lock()
+_warmup_pid = None
+
+
+def preload_pdf_libs():
+    """导入 PDF 处理相关模块，重复调用无副作用"""
+    with _state_lock:
+        if _state['pdf'] == 'ready':
+            return
+        _state['pdf'] = 'loading'
+    try:
+        import PyPDF2  # noqa: F401
+        import reportlab.pdfgen.canvas  # noqa: F401
+        import reportlab.lib.utils  # noqa: F401
+    except Exception as e:
+        with _state_lock:
+            _state['pdf'] = 'failed'
+            _state['error'] = str(e)
+        raise
+    with _state_lock:
+        _state['pdf'] = 'ready'
+        _state['pdfLoadedAt'] = time.time()
+
+
+def _warmup_worker():
+    try:
+        preload_pdf_libs()
+    except Exception:
+        pass
+
+
+def in_gunicorn():
+    """是否运行在 gunicorn 下（主进程 fork 前或 worker 中）"""
+    return 'gunicorn.arbiter' in sys.modules
+
+
+def start_background_warmup():
+    """在后台线程中预热，不阻塞 worker 启动；当前进程已预热或正在预热时直接返回 None"""
+    global _warmup_pid
+    pid = os.getpid()
+    with _state_lock:
+        if _state['pdf'] == 'ready' or _warmup_pid == pid:
+            return None
+        # 从父进程继承的 loading / failed 状态在本进程内无效
+        _warmup_pid = pid
+        _state['pdf'] = 'not_loaded'
+        _state['error'] = None
+    thread = threading.Thread(target=_warmup_worker, name='warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def readiness():
+    """返回 (是否就绪, 状态详情)"""
+    from src.utils import ocr
+    # 未经 post_fork 钩子启动（如未加载 gunicorn.conf.py）时在首次就绪检查时补启动
+    start_background_warmup()
+    with _state_lock:
+        status = dict(_state)
+    status['ocr'] = ocr.status()
+    return status['pdf'] == 'ready', status
@@ -0,0 +1,10 @@
+"""WSGI 入口
+
+生产环境示例（在 backend 目录下运行）：
+    gunicorn -c gunicorn.conf.py
+或：
+    ESIGN_PRELOAD=1 gunicorn --preload -w 4 -b 0.0.0.0:5050 src.wsgi:app
+"""
+from src.main import create_app
+
+app = create_app()
@@ -0,0 +1,37 @@
+"""测试公共夹具：临时目录下的应用实例"""
+import pytest
+
+from src.main import create_app
+from src.utils.pdf_sign import generate_test_certificate, shutdown_pool
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'PROCESSED_FOLDER': str(tmp_path / 'processed'),
+        'SEALS_FOLDER': str(tmp_path / 'seals'),
+        'META_FOLDER': str(tmp_path / 'meta'),
+        'PROFILE_DIR': str(tmp_path / 'profiles'),
+        'SIGNING_KEY_PATH': None,
+        'SIGNING_CERT_PATH': None,
+    })
+    yield app
+    # 元数据缓存为进程级，避免用例之间互相影响
+    from src.utils import pdf_meta
+    with pdf_meta._meta_lock:
+        pdf_meta._meta_cache.clear()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(scope='session')
+def signing_cert(tmp_path_factory):
+    """自签名测试证书 (私钥路径, 证书路径)"""
+    key_path, cert_path = generate_test_certificate(str(tmp_path_factory.mktemp('certs')))
+    yield key_path, cert_path
+    shutdown_pool()
@@ -0,0 +1,50 @@
+"""测试用合成数据与签名校验"""
+import hashlib
+import io
+import re
+
+from asn1crypto import cms
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+
+_SIG_RE = re.compile(rb'/ByteRange \[(\d+) (\d+) (\d+) (\d+)\]\s*/Contents <([0-9a-fA-F]+)>')
+
+
+def make_pdf(pages=1, text='contract'):
+    """生成 A4 文本页 PDF"""
+    from reportlab.pdfgen import canvas
+    buffer = io.BytesIO()
+    can = canvas.Canvas(buffer)
+    for page_no in range(1, pages + 1):
+        can.drawString(72, 720, f'{text} - page {page_no}')
+        can.showPage()
+    can.save()
+    return buffer.getvalue()
+
+
+def signatures(data):
+    """返回文件中每个签名的 (ByteRange, CMS DER)"""
+    result = []
+    for match in _SIG_RE.finditer(data):
+        byte_range = [int(match.group(i)) for i in range(1, 5)]
+        result.append((byte_range, bytes.fromhex(match.group(5).decode('ascii'))))
+    return result
+
+
+def verify_signature(data, byte_range, der, cert_path):
+    """重新计算 ByteRange 摘要并用证书公钥验证 CMS 签名，失败时抛出异常"""
+    start1, length1, start2, length2 = byte_range
+    digest = hashlib.sha256(data[start1:start1 + length1] + data[start2:start2 + length2]).digest()
+
+    signed_data = cms.ContentInfo.load(der)['content']
+    signer_info = signed_data['signer_infos'][0]
+    signed_attrs = signer_info['signed_attrs']
+    message_digest = next(attr['values'][0].native for attr in signed_attrs if attr['type'].native == 'message_digest')
+    assert message_digest == digest
+
+    # 签名针对 SET OF 编码，SignerInfo 中为 [0] 隐式标签，验签前还原
+    signed_bytes = b'\x31' + signed_attrs.dump()[1:]
+    with open(cert_path, 'rb') as f:
+        certificate = x509.load_pem_x509_certificate(f.read())
+    certificate.public_key().verify(signer_info['signature'].native, signed_bytes, padding.PKCS1v15(), hashes.SHA256())
@@ -0,0 +1,107 @@
+"""文件下发：Range / 条件请求与代理下发模式"""
+import os
+
+import pytest
+
+DATA = bytes(range(256)) * 20
+FILE_SIZE = len(DATA)
+
+
+@pytest.fixture
+def stored_file(app):
+    file_id = 'delivery-test'
+    file_path = os.path.join(app.config['PROCESSED_FOLDER'], f'{file_id}.pdf')
+    with open(file_path, 'wb') as f:
+        f.write(DATA)
+    return file_id, file_path
+
+
+def _download(client, file_id, **headers):
+    return client.get(f'/api/files/download/{file_id}', headers=headers)
+
+
+def test_full_download(client, stored_file):
+    res = _download(client, stored_file[0])
+    assert res.status_code == 200
+    assert res.data == DATA
+    assert res.headers['Content-Length'] == str(FILE_SIZE)
+    assert res.headers['Accept-Ranges'] == 'bytes'
+    assert res.headers['Content-Disposition'] == 'attachment; filename="delivery-test.pdf"'
+    assert res.headers['ETag']
+
+
+@pytest.mark.parametrize('range_header, start, stop', [
+    ('bytes=0-99', 0, 100),
+    ('bytes=100-', 100, FILE_SIZE),
+    ('bytes=-100', FILE_SIZE - 100, FILE_SIZE),
+    (f'bytes=4000-{FILE_SIZE + 500}', 4000, FILE_SIZE),
+])
+def test_single_range(client, stored_file, range_header, start, stop):
+    res = _download(client, stored_file[0], Range=range_header)
+    assert res.status_code == 206
+    assert res.data == DATA[start:stop]
+    assert res.headers['Content-Length'] == str(stop - start)
+    assert res.headers['Content-Range'] == f'bytes {start}-{stop - 1}/{FILE_SIZE}'
+
+
+def test_unsatisfiable_range(client, stored_file):
+    res = _download(client, stored_file[0], Range=f'bytes={FILE_SIZE}-')
+    assert res.status_code == 416
+    assert res.headers['Content-Range'] == f'bytes */{FILE_SIZE}'
+    assert res.data == b''
+
+
+def test_multi_range_falls_back_to_full_file(client, stored_file):
+    res = _download(client, stored_file[0], Range='bytes=0-9,20-29')
+    assert res.status_code == 200
+    assert res.data == DATA
+    assert 'Content-Range' not in res.headers
+
+
+def test_if_none_match_returns_304(client, stored_file):
+    etag = _download(client, stored_file[0]).headers['ETag']
+    res = _download(client, stored_file[0], **{'If-None-Match': etag})
+    assert res.status_code == 304
+    assert res.data == b''
+    assert res.headers['ETag'] == etag
+
+
+def test_if_range(client, stored_file):
+    etag = _download(client, stored_file[0]).headers['ETag']
+    res = _download(client, stored_file[0], Range='bytes=0-99', **{'If-Range': etag})
+    assert res.status_code == 206
+    assert res.data == DATA[:100]
+
+    # 文件已变化（ETag 不匹配）时忽略 Range，返回整个文件
+    res = _download(client, stored_file[0], Range='bytes=0-99', **{'If-Range': '"stale"'})
+    assert res.status_code == 200
+    assert res.data == DATA
+
+
+def test_x_accel_mode(app, client, stored_file):
+    app.config['FILE_DELIVERY_MODE'] = 'x-accel'
+    res = _download(client, stored_file[0])
+    assert res.status_code == 200
+    assert res.data == b''
+    assert res.headers['X-Accel-Redirect'] == '/protected/processed/delivery-test.pdf'
+    assert res.headers['Content-Type'] == 'application/pdf'
+    assert res.headers['Content-Disposition'] == 'attachment; filename="delivery-test.pdf"'
+
+
+def test_x_sendfile_mode(app, client, stored_file):
+    app.config['FILE_DELIVERY_MODE'] = 'x-sendfile'
+    res = client.get(f'/api/files/view/{stored_file[0]}')
+    assert res.status_code == 200
+    assert res.data == b''
+    assert res.headers['X-Sendfile'] == os.path.realpath(stored_file[1])
+    assert res.headers['Content-Disposition'] == 'inline; filename="delivery-test.pdf"'
+
+
+def test_non_ascii_filename(app, client):
+    with open(os.path.join(app.config['PROCESSED_FOLDER'], 'C1-对方-合同.pdf'), 'wb') as f:
+        f.write(DATA)
+    res = client.get('/api/files/download/unused', query_string={
+        'contractNumber': 'C1', 'counterparty': '对方', 'contractName': '合同'})
+    assert res.status_code == 200
+    assert res.headers['Content-Disposition'] == (
+        "attachment; filename=\"C1--.pdf\"; filename*=UTF-8''C1-%E5%AF%B9%E6%96%B9-%E5%90%88%E5%90%8C.pdf")
@@ -0,0 +1,54 @@
+"""pdf_sign 字节级签名测试：ByteRange 摘要、CMS 验签与二次签名"""
+import pytest
+from PyPDF2 import PdfReader
+
+from src.utils.pdf_sign import get_signer, sign_pdf
+from tests.helpers import make_pdf, signatures, verify_signature
+
+
+def test_sign_and_verify_byte_range(tmp_path, signing_cert):
+    key_path, cert_path = signing_cert
+    source = tmp_path / 'in.pdf'
+    source.write_bytes(make_pdf(pages=2))
+    output = tmp_path / 'out.pdf'
+
+    info = sign_pdf(str(source), str(output), get_signer(key_path, cert_path), page=2, reason='test')
+
+    data = output.read_bytes()
+    assert data.startswith(source.read_bytes())
+    found = signatures(data)
+    assert len(found) == 1
+    byte_range, der = found[0]
+    assert byte_range == info['byteRange']
+    assert byte_range[0] == 0 and byte_range[2] + byte_range[3] == len(data)
+    verify_signature(data, byte_range, der, cert_path)
+
+    # 签名覆盖范围内任意字节被改动都应验签失败
+    tampered = bytearray(data)
+    tampered[byte_range[1] // 2] ^= 0xFF
+    with pytest.raises(AssertionError):
+        verify_signature(bytes(tampered), byte_range, der, cert_path)
+
+
+def test_second_signature_keeps_first_valid(tmp_path, signing_cert):
+    key_path, cert_path = signing_cert
+    signer = get_signer(key_path, cert_path)
+    path = tmp_path / 'contract.pdf'
+    path.write_bytes(make_pdf(pages=2))
+
+    sign_pdf(str(path), str(path), signer, page=1)
+    first_size = path.stat().st_size
+    sign_pdf(str(path), str(path), signer, page=2)
+
+    data = path.read_bytes()
+    found = signatures(data)
+    assert len(found) == 2
+    (first_range, first_der), (second_range, second_der) = found
+    # 第一个签名只覆盖第一次签名后的文件，第二个签名覆盖整个文件
+    assert first_range[2] + first_range[3] == first_size
+    assert second_range[2] + second_range[3] == len(data)
+    verify_signature(data, first_range, first_der, cert_path)
+    verify_signature(data, second_range, second_der, cert_path)
+
+    fields = PdfReader(str(path)).get_fields()
+    assert sorted(fields) == ['Signature1', 'Signature2']
@@ -0,0 +1,107 @@
+"""签章与批量签名接口：apply-seal 数字签名、sign-batch 文件ID校验"""
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from tests.helpers import make_pdf, signatures, verify_signature
+
+CONTRACT_INFO = {'contractNumber': 'C1', 'counterparty': 'ACME', 'contractName': 'contract'}
+
+
+@pytest.fixture
+def signing_app(app, signing_cert):
+    app.config['SIGNING_KEY_PATH'], app.config['SIGNING_CERT_PATH'] = signing_cert
+    Image.new('RGBA', (64, 64), (220, 0, 0, 255)).save(os.path.join(app.config['SEALS_FOLDER'], '1.png'))
+    return app
+
+
+@pytest.fixture
+def merged_id(signing_app):
+    client = signing_app.test_client()
+    res = client.post('/api/files/upload', data={'mainContract': (io.BytesIO(make_pdf(pages=2)), 'main.pdf')},
+                      content_type='multipart/form-data')
+    main_id = res.get_json()['mainContract']['id']
+    return client.post('/api/files/merge', json={'mainFileId': main_id}).get_json()['mergedFile']['id']
+
+
+def _apply_seal(client, file_id, **extra):
+    return client.post('/api/files/apply-seal', json={
+        'fileId': file_id,
+        'sealConfig': {'page': 2, 'x': 100, 'y': 100, 'sealId': 1},
+        'contractInfo': CONTRACT_INFO,
+        **extra
+    })
+
+
+def test_apply_seal_adds_digital_signature(signing_app, merged_id, signing_cert):
+    res = _apply_seal(signing_app.test_client(), merged_id)
+    assert res.status_code == 200
+    sealed = res.get_json()['sealedFile']
+    assert sealed['name'] == 'C1-ACME-contract.pdf'
+    assert sealed['signature']['signer']
+
+    with open(sealed['path'], 'rb') as f:
+        data = f.read()
+    assert sealed['size'] == len(data)
+    found = signatures(data)
+    assert len(found) == 1
+    assert found[0][0] == sealed['signature']['byteRange']
+    verify_signature(data, *found[0], signing_cert[1])
+    # 只留下最终文件，没有未签名的中间文件
+    assert sorted(os.listdir(signing_app.config['PROCESSED_FOLDER'])) == sorted(['C1-ACME-contract.pdf', f'{merged_id}.pdf'])
+
+
+def test_apply_seal_signer_config_error_leaves_no_file(signing_app, merged_id):
+    signing_app.config['SIGNING_KEY_PASSWORD'] = 'wrong'
+    res = _apply_seal(signing_app.test_client(), merged_id)
+    assert res.status_code == 500
+    assert '签名证书加载失败' in res.get_json()['error']
+    assert os.listdir(signing_app.config['PROCESSED_FOLDER']) == [f'{merged_id}.pdf']
+
+
+def test_sign_batch_signs_sealed_file_and_updates_meta(signing_app, merged_id, signing_cert):
+    client = signing_app.test_client()
+    sealed = _apply_seal(client, merged_id, digitalSignature=False).get_json()['sealedFile']
+
+    res = client.post('/api/files/sign-batch', json={'fileIds': [sealed['id']]})
+    assert res.status_code == 200
+    result = res.get_json()['results'][0]
+    assert result['success'] is True
+
+    with open(sealed['path'], 'rb') as f:
+        data = f.read()
+    assert result['size'] == len(data)
+    verify_signature(data, *signatures(data)[0], signing_cert[1])
+
+    from src.utils import pdf_meta
+    pdf_meta._meta_cache.clear()
+    meta = pdf_meta.load_file_meta(signing_app.config['META_FOLDER'], sealed['id'])
+    assert meta['size'] == len(data)
+    assert meta['signature']['byteRange'] == result['byteRange']
+
+
+@pytest.mark.parametrize('file_id', ['C1', 'pdf', 'contract', 'C1-ACME-contract.pdf', '../processed'])
+def test_sign_batch_rejects_partial_id_match(signing_app, merged_id, file_id):
+    client = signing_app.test_client()
+    sealed = _apply_seal(client, merged_id, digitalSignature=False).get_json()['sealedFile']
+    with open(sealed['path'], 'rb') as f:
+        before = f.read()
+
+    res = client.post('/api/files/sign-batch', json={'fileIds': [file_id]})
+    assert res.status_code == 200
+    assert res.get_json()['results'] == [{'id': file_id, 'success': False, 'error': '文件不存在'}]
+    with open(sealed['path'], 'rb') as f:
+        assert f.read() == before
+
+
+@pytest.mark.parametrize('body', [
+    {'fileIds': 'abc'},
+    {'fileIds': [['abc']]},
+    {'fileIds': ['abc', 1]},
+    ['abc'],
+])
+def test_sign_batch_rejects_invalid_file_ids(signing_app, body):
+    res = signing_app.test_client().post('/api/files/sign-batch', json=body)
+    assert res.status_code == 400
@@ -0,0 +1,122 @@
+"""上传校验：结构检查、加密/空文档拒绝、整批清理与元数据持久化"""
+import io
+import json
+import os
+
+import pytest
+from PyPDF2 import PdfReader, PdfWriter
+
+from src.utils import pdf_meta
+from tests.helpers import make_pdf
+
+
+def _encrypted_pdf():
+    writer = PdfWriter()
+    for page in PdfReader(io.BytesIO(make_pdf())).pages:
+        writer.add_page(page)
+    writer.encrypt('secret')
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def _empty_pdf():
+    buffer = io.BytesIO()
+    PdfWriter().write(buffer)
+    return buffer.getvalue()
+
+
+def _shifted_startxref(data, delta):
+    index = data.rindex(b'startxref')
+    offset = int(data[index + len(b'startxref'):].split()[0])
+    return data[:index] + b'startxref\n%d\n%%%%EOF\n' % (offset + delta)
+
+
+def _upload_main(client, data, filename='main.pdf'):
+    return client.post('/api/files/upload', data={'mainContract': (io.BytesIO(data), filename)},
+                       content_type='multipart/form-data')
+
+
+def test_upload_returns_and_persists_meta(app, client):
+    res = _upload_main(client, make_pdf(pages=3))
+    assert res.status_code == 200
+    info = res.get_json()['mainContract']
+    assert info['pages'] == 3
+    assert info['pdfVersion'] == '1.3'
+    assert len(info['pageSizes']) == 3
+    assert info['pageSizes'][0] == {'width': 595.28, 'height': 841.89, 'rotation': 0}
+    assert os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], f"{info['id']}.pdf"))
+
+    # 元数据落盘，清空进程内缓存后从 JSON 读回
+    meta_path = os.path.join(app.config['META_FOLDER'], f"{info['id']}.json")
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        assert json.load(f) == info
+    pdf_meta._meta_cache.clear()
+    assert pdf_meta.load_file_meta(app.config['META_FOLDER'], info['id']) == info
+
+
+def test_merge_uses_upload_meta(client):
+    main_id = _upload_main(client, make_pdf(pages=2)).get_json()['mainContract']['id']
+    res = client.post('/api/files/upload', data={
+        'attachments': [(io.BytesIO(make_pdf(pages=1)), 'a.pdf'), (io.BytesIO(make_pdf(pages=4)), 'b.pdf')]
+    }, content_type='multipart/form-data')
+    attachment_ids = [item['id'] for item in res.get_json()['attachments']]
+
+    merged = client.post('/api/files/merge', json={'mainFileId': main_id, 'attachmentIds': attachment_ids}).get_json()
+    assert merged['mergedFile']['pages'] == 7
+    assert len(merged['mergedFile']['pageSizes']) == 7
+
+
+@pytest.mark.parametrize('data, message', [
+    (b'', '文件为空'),
+    (b'hello world, not a pdf' * 10, '文件头缺失'),
+    (make_pdf()[:400], '文件不完整'),
+    (_encrypted_pdf(), '加密'),
+    (_empty_pdf(), '不包含任何页面'),
+])
+def test_upload_rejects_invalid_pdf(app, client, data, message):
+    res = _upload_main(client, data)
+    assert res.status_code == 400
+    assert message in res.get_json()['error']
+    assert os.listdir(app.config['UPLOAD_FOLDER']) == []
+    assert os.listdir(app.config['META_FOLDER']) == []
+
+
+@pytest.mark.parametrize('data', [
+    make_pdf() + b'\n' * 3000,
+    _shifted_startxref(make_pdf(), 2),
+])
+def test_upload_accepts_files_the_parser_can_repair(client, data):
+    res = _upload_main(client, data)
+    assert res.status_code == 200
+    assert res.get_json()['mainContract']['pages'] == 1
+
+
+def test_bad_attachment_rejects_whole_batch(app, client):
+    res = client.post('/api/files/upload', data={
+        'attachments': [(io.BytesIO(make_pdf()), 'good.pdf'), (io.BytesIO(make_pdf()[:400]), 'bad.pdf')]
+    }, content_type='multipart/form-data')
+    assert res.status_code == 400
+    details = res.get_json()['details']
+    assert len(details) == 1 and details[0].startswith('bad.pdf')
+    assert os.listdir(app.config['UPLOAD_FOLDER']) == []
+    assert os.listdir(app.config['META_FOLDER']) == []
+
+
+def test_save_error_rejects_whole_batch(app, client, monkeypatch):
+    from src.routes import files
+    original = files.save_and_inspect
+
+    def failing_save(file_storage, file_path):
+        if file_storage.filename == 'broken.pdf':
+            raise OSError('No space left on device')
+        return original(file_storage, file_path)
+
+    monkeypatch.setattr(files, 'save_and_inspect', failing_save)
+    res = client.post('/api/files/upload', data={
+        'attachments': [(io.BytesIO(make_pdf()), 'good.pdf'), (io.BytesIO(make_pdf()), 'broken.pdf')]
+    }, content_type='multipart/form-data')
+    assert res.status_code == 400
+    assert 'No space left on device' in res.get_json()['error']
+    assert os.listdir(app.config['UPLOAD_FOLDER']) == []
+    assert os.listdir(app.config['META_FOLDER']) == []